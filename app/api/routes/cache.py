@@ -0,0 +1,16 @@
+# app/api/routes/cache.py
+
+from fastapi import APIRouter
+from app.services.registry import registry
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    embeddings = registry.embeddings()
+    answer_cache = registry.answer_cache()
+    return {
+        "embeddings": embeddings.stats() if hasattr(embeddings, "stats") else None,
+        "answers": answer_cache.stats() if answer_cache is not None else None,
+        "rerank": registry.reranker().stats(),
+    }
@@ -1,9 +1,13 @@
 # app/api/routes/chat.py
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.services.chat import ChatService
+from app.services.registry import get_chat_service, registry
+from app.core.exceptions import AppException
 from app.schemas.chat import ChatRequest, ChatResponse
 from app.core.logging_config import logging
+import json
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -11,11 +15,40 @@ logger = logging.getLogger(__name__)
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     chat_request: ChatRequest,
-    chat_service: ChatService = Depends()
+    chat_service: ChatService = Depends(get_chat_service)
 ):
+    await registry.organizations().ensure(chat_request.organization_id)
     try:
         response = await chat_service.generate_response(chat_request)
         return response
+    except AppException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream(
+    chat_request: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """Server-Sent Events variant of /chat.
+
+    Emits a ``context`` event with the retrieved docs and questions, then one
+    ``token`` event per LLM chunk, and a final ``done`` (or ``error``) event.
+    """
+    await registry.organizations().ensure(chat_request.organization_id)
+
+    async def event_stream():
+        try:
+            async for event in chat_service.stream_response(chat_request):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            logger.error(f"Error in chat stream endpoint: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,20 +1,30 @@
 # app/api/routes/document.py
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from app.services.document_ingestion import DocumentIngestionService
 from app.services.vector_db import VectorDBService
-from app.schemas.document import DocumentSearch, TaskStatusResponse, DocumentUploadResponse, RelevantDocumentResponse
-from app.core.celery_app import celery_app
-from celery.exceptions import TimeoutError
-import tempfile
+from app.services.registry import get_document_ingestion_service, get_vector_db_service, registry
+from app.schemas.document import (
+    BatchStatusResponse,
+    BulkUploadResponse,
+    DocumentSearch,
+    DocumentUploadResponse,
+    RelevantDocumentResponse,
+    TaskStatusResponse,
+)
+from app.services import task_status
+import json
 import os
 import uuid
-from langchain_cohere import CohereRerank
 from langchain.schema import Document
 from app.core.config import settings
 
 from app.core.exceptions import AppException
 from app.core.logging_config import logging
+from app.core.executor import run_blocking
+from app.utils.uploads import extract_zip_upload, save_upload
+from app.tasks.pipeline import batches, dispatch_batch, queue_ingestion
 from typing import List
 
 router = APIRouter()
@@ -23,40 +33,222 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
+def _queue_ingestion(upload, organization_id: str, task_id: str, source_document_id: str, mode: str = "create"):
+    queue_ingestion(
+        upload.path,
+        organization_id,
+        task_id,
+        file_name=upload.file_name,
+        content_hash=upload.content_hash,
+        source_document_id=source_document_id,
+        mode=mode,
+    )
+
+
 @router.post("/documents/upload", response_model=DocumentUploadResponse)
 async def upload_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    ingestion_service: DocumentIngestionService = Depends(),
+    ingestion_service: DocumentIngestionService = Depends(get_document_ingestion_service),
 ):
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(await file.read())
-        temp_file_path = temp_file.name
-    
     # TODO - Get organization from auth headers
     organization_id = 'shipsy'
+    await registry.organizations().ensure(organization_id)
+
+    upload = await save_upload(file)
 
     # Generate a unique task ID
     task_id = str(uuid.uuid4())
+    source_document_id = str(uuid.uuid4())
+
+    # Identical content already ingested (or in flight) for this organization
+    existing = await run_blocking(
+        ingestion_service.manifest.claim,
+        organization_id,
+        upload.content_hash,
+        source_document_id,
+        task_id,
+    )
+    if existing is not None:
+        os.unlink(upload.path)
+        logger.info(f"Duplicate upload of {existing['source_document_id']} for {organization_id}")
+        return DocumentUploadResponse(
+            task_id=existing.get('task_id'),
+            source_document_id=existing['source_document_id'],
+            duplicate=True,
+            message="Document already ingested" if existing.get('status') == 'completed' else "Document already queued for processing",
+        )
 
     try:
         # Queue the document processing task
-        celery_app.send_task(
-            'app.tasks.document.process_document',
-            args=[temp_file_path, organization_id, task_id],
-            task_id=task_id
+        _queue_ingestion(upload, organization_id, task_id, source_document_id)
+
+        return DocumentUploadResponse(
+            task_id=task_id,
+            source_document_id=source_document_id,
+            message="Document upload queued for processing",
+        )
+    except Exception as e:
+        os.unlink(upload.path)
+        await run_blocking(ingestion_service.manifest.release, organization_id, upload.content_hash, source_document_id)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/documents/upload/bulk", response_model=BulkUploadResponse)
+async def upload_documents_bulk(
+    files: List[UploadFile] = File(...),
+    ingestion_service: DocumentIngestionService = Depends(get_document_ingestion_service),
+):
+    """Upload many files (or zip archives of files) as one batch.
+
+    Files are ingested at most ``BULK_MAX_CONCURRENCY`` at a time; progress
+    for the whole batch is available from ``/documents/batch/{batch_id}``.
+    """
+    # TODO - Get organization from auth headers
+    organization_id = 'shipsy'
+    await registry.organizations().ensure(organization_id)
+    batch_id = str(uuid.uuid4())
+
+    uploads = []
+    try:
+        for file in files:
+            if (file.filename or "").lower().endswith(".zip"):
+                archive = await save_upload(file, max_bytes=settings.BULK_UPLOAD_MAX_BYTES)
+                try:
+                    uploads.extend(await run_blocking(
+                        extract_zip_upload,
+                        archive,
+                        max_total_bytes=settings.BULK_EXTRACT_MAX_BYTES - sum(upload.size for upload in uploads),
+                    ))
+                finally:
+                    os.unlink(archive.path)
+            else:
+                uploads.append(await save_upload(file))
+            if len(uploads) > settings.BULK_UPLOAD_MAX_FILES:
+                raise AppException(status_code=400, detail=f"A batch can hold at most {settings.BULK_UPLOAD_MAX_FILES} files")
+    except Exception:
+        for upload in uploads:
+            os.unlink(upload.path)
+        raise
+
+    items, duplicates = [], []
+    for upload in uploads:
+        task_id = str(uuid.uuid4())
+        source_document_id = str(uuid.uuid4())
+        existing = await run_blocking(
+            ingestion_service.manifest.claim,
+            organization_id,
+            upload.content_hash,
+            source_document_id,
+            task_id,
+        )
+        if existing is not None:
+            os.unlink(upload.path)
+            duplicates.append({"file_name": upload.file_name, "source_document_id": existing['source_document_id']})
+            continue
+        items.append({
+            "task_id": task_id,
+            "file_path": upload.path,
+            "file_name": upload.file_name,
+            "content_hash": upload.content_hash,
+            "organization_id": organization_id,
+            "source_document_id": source_document_id,
+        })
+
+    try:
+        await run_blocking(batches.create, batch_id, organization_id, items, duplicates)
+        await run_blocking(dispatch_batch, batch_id, settings.BULK_MAX_CONCURRENCY)
+    except Exception as e:
+        for item in items:
+            if os.path.exists(item["file_path"]):
+                os.unlink(item["file_path"])
+            await run_blocking(ingestion_service.manifest.release, organization_id, item["content_hash"], item["source_document_id"])
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logger.info(f"Queued batch {batch_id}: {len(items)} files, {len(duplicates)} duplicates")
+    return BulkUploadResponse(
+        batch_id=batch_id,
+        total=len(uploads),
+        queued=len(items),
+        duplicates=len(duplicates),
+        message="Batch queued for processing",
+    )
+
+
+@router.get("/documents/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str):
+    batch = await run_blocking(batches.get, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+
+@router.put("/documents/{source_document_id}", response_model=DocumentUploadResponse)
+async def replace_document(
+    source_document_id: str,
+    file: UploadFile = File(...),
+    ingestion_service: DocumentIngestionService = Depends(get_document_ingestion_service),
+    vector_db_service: VectorDBService = Depends(get_vector_db_service),
+):
+    """Upload a new version of an existing document.
+
+    Only chunks whose content changed are embedded again; the rest keep
+    their stored embeddings.
+    """
+    # TODO - Get organization from auth headers
+    organization_id = 'shipsy'
+    await registry.organizations().ensure(organization_id)
+
+    upload = await save_upload(file)
+
+    if not await vector_db_service.document_exists(organization_id, source_document_id):
+        os.unlink(upload.path)
+        raise AppException(status_code=404, detail=f"Document {source_document_id} not found")
+
+    task_id = str(uuid.uuid4())
+    existing = await run_blocking(
+        ingestion_service.manifest.claim,
+        organization_id,
+        upload.content_hash,
+        source_document_id,
+        task_id,
+    )
+    if existing is not None:
+        os.unlink(upload.path)
+        if existing['source_document_id'] == source_document_id:
+            return DocumentUploadResponse(
+                task_id=existing.get('task_id'),
+                source_document_id=source_document_id,
+                message="Document unchanged" if existing.get('status') == 'completed' else "Document already queued for processing",
+            )
+        return DocumentUploadResponse(
+            task_id=existing.get('task_id'),
+            source_document_id=existing['source_document_id'],
+            duplicate=True,
+            message="Content already ingested as another document",
         )
 
-        return DocumentUploadResponse(task_id=task_id, message="Document upload queued for processing")
+    try:
+        _queue_ingestion(upload, organization_id, task_id, source_document_id, mode='replace')
+
+        return DocumentUploadResponse(
+            task_id=task_id,
+            source_document_id=source_document_id,
+            message="Document update queued for processing",
+        )
     except Exception as e:
+        os.unlink(upload.path)
+        await run_blocking(ingestion_service.manifest.release, organization_id, upload.content_hash, source_document_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/documents/relevant", response_model=List[Document])
 async def get_relevant_documents(
     search_params: DocumentSearch,
-    vector_db_service: VectorDBService = Depends()
+    vector_db_service: VectorDBService = Depends(get_vector_db_service)
 ):
+    await registry.organizations().ensure(search_params.organization_id)
     try:
         logger.info(f"Searching for relevant documents with query: {search_params.query}")
         
@@ -64,54 +256,36 @@ async def get_relevant_documents(
         results = await vector_db_service.search_documents(
             search_params.organization_id,
             search_params.query,
-            k=10  # Fetch top 10 results initially
+            k=settings.DOCUMENT_RERANK_CANDIDATES
         )
         
         if not results:
             logger.info("No documents found in initial search")
             return []
 
-        # Initialize CohereRerank
+        # Shared reranker (backend chosen per organization)
         try:
-            os.environ["COHERE_API_KEY"] = settings.COHERE_API_KEY
-            cohere_client = CohereRerank(model="rerank-english-v2.0")
+            reranker = registry.reranker()
         except Exception as e:
-            logger.error(f"Failed to initialize CohereRerank: {str(e)}")
+            logger.error(f"Failed to initialize reranker: {str(e)}")
             raise AppException(status_code=500, detail="Failed to initialize reranking service")
 
-        # Prepare documents for reranking
-        documents = [doc.page_content for doc in results]
-        
         # Perform reranking
         try:
-            reranked_results = cohere_client.rerank(
-                documents=documents,
-                query=search_params.query,
-                top_n=5  # Return top 5 most relevant results
+            final_docs = await run_blocking(
+                reranker.rerank_documents,
+                search_params.query,
+                results,
+                top_n=5,  # Return top 5 most relevant results
+                threshold=0.15,
+                organization_id=search_params.organization_id,
             )
         except Exception as e:
             logger.error(f"Reranking failed: {str(e)}")
             raise AppException(status_code=500, detail="Document reranking failed")
 
-        # Prepare final response
-        try:    
-            final_docs = []
-            for item in reranked_results:
-                idx = item.get('index')
-                relevance_score = item.get('relevance_score')
-                if idx is None or relevance_score is None:
-                    logger.info(f"Continue due to missing index / relevance score")
-                    continue
-                doc = results[idx]
-                doc.metadata['relevance_score'] = relevance_score
-                if relevance_score > 0.15:
-                    final_docs.append(doc)
-
-            logger.info(f"Successfully retrieved and reranked {len(final_docs)} documents")
-            return final_docs
-        except Exception as e:
-            logger.error(f"Unexpected error in get_relevant_documents: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"{str(e)}")
+        logger.info(f"Successfully retrieved and reranked {len(final_docs)} documents")
+        return final_docs
 
     except AppException as ae:
         raise ae
@@ -122,7 +296,7 @@ async def get_relevant_documents(
 @router.delete("/documents/{source_document_id}")
 async def delete_document(
     source_document_id: str,
-    vector_db_service: VectorDBService = Depends()
+    vector_db_service: VectorDBService = Depends(get_vector_db_service)
 ):
     try:
         organization_id = 'shipsy' # TODO - Use auth to extract the org id
@@ -136,52 +310,36 @@ async def delete_document(
         raise HTTPException(status_code=500, detail=str(e))
         
 
-from celery.exceptions import TimeoutError
-from celery.result import AsyncResult
-
 @router.get("/documents/task/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str):
-    task = AsyncResult(task_id)
-    
-    # Check if the task exists in the result backend
     try:
-        # This will raise a TimeoutError if the task doesn't exist
-        task.get(timeout=1)
-    except Exception as e:
-        if isinstance(e, TimeoutError):
-        # Task doesn't exist or hasn't been registered yet
-            raise HTTPException(status_code=404, detail="Task not found or not yet registered")
-        else:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    try:
-        if task.state == 'PENDING':
-            response = {
-                'status': task.state,
-                'current': 0,
-                'total': 1,
-                'status': 'Pending...'
-            }
-        elif task.state != 'FAILURE':
-            response = {
-                'status': task.state,
-                'current': task.info.get('current', 0) if isinstance(task.info, dict) else 0,
-                'total': task.info.get('total', 1) if isinstance(task.info, dict) else 1,
-                'status': task.info.get('status', '') if isinstance(task.info, dict) else str(task.info)
-            }
-            if isinstance(task.info, dict) and 'result' in task.info:
-                response['result'] = task.info['result']
-        else:
-            response = {
-                'status': task.state,
-                'current': 1,
-                'total': 1,
-                'status': str(task.info),
-            }
-        
-        return response
+        return await task_status.get_task_status(task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
 
-    
\ No newline at end of file
+
+@router.get("/documents/task/{task_id}/events")
+async def stream_task_status(task_id: str, request: Request):
+    """Server-Sent Events stream of a task's progress.
+
+    Emits a ``status`` event with the current state, one ``status`` event
+    per progress update and ends after the SUCCESS or FAILURE event.
+    """
+    async def event_stream():
+        try:
+            async for status in task_status.stream_task_events(task_id):
+                if await request.is_disconnected():
+                    return
+                if status is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+        except Exception as e:
+            logger.error(f"Error in task status stream for {task_id}: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
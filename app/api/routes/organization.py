@@ -2,14 +2,23 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from app.services.organization import OrganizationService
-from app.schemas.organization import OrganizationCreate, OrganizationUpdate
+from app.services.registry import get_organization_service, registry
+from app.schemas.organization import (
+    CollectionMigrationQueuedResponse,
+    OrganizationCollectionsResponse,
+    OrganizationCreate,
+    OrganizationUpdate,
+)
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.executor import run_blocking
 from app.core.logging_config import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/organizations", status_code=201)
-async def create_organization(org_data: OrganizationCreate, service: OrganizationService = Depends()):
+async def create_organization(org_data: OrganizationCreate, service: OrganizationService = Depends(get_organization_service)):
     try:
         organization = await service.create_organization(org_data.name, org_data.description)
         logger.info(f"Organization created: {org_data.name}")
@@ -19,7 +28,7 @@ async def create_organization(org_data: OrganizationCreate, service: Organizatio
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/organizations/{org_name}")
-async def update_organization(org_name: str, org_data: OrganizationUpdate, service: OrganizationService = Depends()):
+async def update_organization(org_name: str, org_data: OrganizationUpdate, service: OrganizationService = Depends(get_organization_service)):
     try:
         updated_org = await service.update_organization(org_name, org_data.description)
         logger.info(f"Organization updated: {org_name}")
@@ -29,7 +38,7 @@ async def update_organization(org_name: str, org_data: OrganizationUpdate, servi
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/organizations/{org_name}")
-async def get_organization(org_name: str, service: OrganizationService = Depends()):
+async def get_organization(org_name: str, service: OrganizationService = Depends(get_organization_service)):
     try:
         organization = await service.get_organization(org_name)
         logger.info(f"Organization retrieved: {org_name}")
@@ -40,7 +49,7 @@ async def get_organization(org_name: str, service: OrganizationService = Depends
         raise HTTPException(status_code=404, detail="Organization not found")
     
 @router.delete("/organizations/{org_name}")
-async def delete_organization(org_name: str, service: OrganizationService = Depends()):
+async def delete_organization(org_name: str, service: OrganizationService = Depends(get_organization_service)):
     try:
         result = await service.delete_organization(org_name)
         logger.info(f"Organization deleted: {org_name}")
@@ -48,3 +57,28 @@ async def delete_organization(org_name: str, service: OrganizationService = Depe
     except ValueError as e:
         logger.warning(f"Organization deletion failed: {str(e)}")
         raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/organizations/{org_name}/collections", response_model=OrganizationCollectionsResponse)
+async def get_organization_collections(org_name: str):
+    await registry.organizations().ensure(org_name)
+    return OrganizationCollectionsResponse(
+        organization_id=org_name,
+        layout=settings.COLLECTION_LAYOUT,
+        documents=await run_blocking(registry.document_collections().state, org_name, True),
+        questions_answers=await run_blocking(registry.question_collections().state, org_name, True),
+    )
+
+@router.post("/organizations/{org_name}/collections/migrate", response_model=CollectionMigrationQueuedResponse)
+async def migrate_organization_collections(org_name: str):
+    """Move the organization's stored documents and QA pairs into its own
+    collections. Runs in the background; stored vectors are reused."""
+    await registry.organizations().ensure(org_name)
+    try:
+        task = celery_app.send_task(
+            'app.tasks.collections.migrate_organization_collections',
+            args=[org_name],
+        )
+        return CollectionMigrationQueuedResponse(task_id=task.id, message="Collection migration queued")
+    except Exception as e:
+        logger.error(f"Error queueing collection migration: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
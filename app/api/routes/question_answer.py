@@ -2,8 +2,21 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from app.services.question_answer import QuestionAnswerService
-from app.schemas.question_answer import QuestionAnswerCreate, QuestionAnswerSearch, QuestionAnswerResponse
-from typing import List
+from app.services.registry import get_question_answer_service, registry
+from app.schemas.question_answer import (
+    QuestionAnswerBulkCreate,
+    QuestionAnswerBulkResponse,
+    QuestionAnswerCreate,
+    QuestionAnswerResponse,
+    QuestionAnswerSearch,
+    QuestionCompactionQueuedResponse,
+    QuestionCompactionReport,
+    QuestionMergeStateResponse,
+)
+from app.core.celery_app import celery_app
+from app.core.executor import run_blocking
+from app.core.config import settings
+from typing import List, Optional
 from app.core.logging_config import logging
 from langchain.schema import Document
 from app.core.exceptions import AppException
@@ -14,7 +27,7 @@ logger = logging.getLogger(__name__)
 @router.post("/questions", response_model=QuestionAnswerResponse)
 async def add_question_answer(
     qa_data: QuestionAnswerCreate,
-    qa_service: QuestionAnswerService = Depends()
+    qa_service: QuestionAnswerService = Depends(get_question_answer_service)
 ):
     try:
         result = await qa_service.add_question_answer(qa_data)
@@ -23,11 +36,25 @@ async def add_question_answer(
         logger.error(f"Error adding question and answer: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/questions/bulk", response_model=QuestionAnswerBulkResponse)
+async def import_question_answers(
+    bulk_data: QuestionAnswerBulkCreate,
+    qa_service: QuestionAnswerService = Depends(get_question_answer_service)
+):
+    if len(bulk_data.items) > settings.QA_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A bulk import can hold at most {settings.QA_BULK_MAX_ITEMS} items")
+    try:
+        return await qa_service.import_question_answers(bulk_data.items)
+    except Exception as e:
+        logger.error(f"Error importing questions and answers: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/questions/relevant", response_model=List[Document])
 async def get_relevant_questions(
     search_params: QuestionAnswerSearch,
-    qa_service: QuestionAnswerService = Depends()
+    qa_service: QuestionAnswerService = Depends(get_question_answer_service)
 ):
+    await registry.organizations().ensure(search_params.organization_id)
     try:
         results = await qa_service.get_relevant_questions(search_params)
         return results
@@ -37,13 +64,50 @@ async def get_relevant_questions(
         logger.error(f"Error retrieving relevant questions: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
+@router.post("/questions/compaction/{organization_id}", response_model=QuestionCompactionQueuedResponse)
+async def compact_questions(organization_id: str):
+    try:
+        task = celery_app.send_task(
+            'app.tasks.question_answer.compact_question_answers',
+            args=[organization_id],
+        )
+        return QuestionCompactionQueuedResponse(task_id=task.id, message="Compaction queued")
+    except Exception as e:
+        logger.error(f"Error queueing question compaction: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/questions/compaction/{organization_id}", response_model=QuestionCompactionReport)
+async def get_compaction_report(
+    organization_id: str,
+    qa_service: QuestionAnswerService = Depends(get_question_answer_service)
+):
+    report = await run_blocking(qa_service.merge_queue.compaction_report, organization_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No compaction has run for this organization")
+    return report
+
+@router.get("/questions/{question_id}/merge", response_model=QuestionMergeStateResponse)
+async def get_merge_state(
+    question_id: str,
+    organization_id: Optional[str] = None,
+    qa_service: QuestionAnswerService = Depends(get_question_answer_service)
+):
+    try:
+        return await qa_service.get_merge_state(question_id, organization_id)
+    except AppException as ae:
+        raise HTTPException(status_code=ae.status_code, detail=ae.detail)
+    except Exception as e:
+        logger.error(f"Error reading merge state: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/questions/{question_id}")
 async def delete_question(
     question_id: str,
-    qa_service: QuestionAnswerService = Depends()
+    organization_id: Optional[str] = None,
+    qa_service: QuestionAnswerService = Depends(get_question_answer_service)
 ):
     try:
-        result = await qa_service.delete_question(question_id)
+        result = await qa_service.delete_question(question_id, organization_id)
         return result
     except Exception as e:
         logger.error(f"Error deleting question: {str(e)}")
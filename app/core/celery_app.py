@@ -3,8 +3,8 @@ from app.core.config import settings
 
 celery_app = Celery(
     "tasks",
-    broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0",
-    backend=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0"
+    broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.CELERY_REDIS_DB}",
+    backend=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.CELERY_REDIS_DB}"
 )
 
 celery_app.conf.update(
@@ -13,9 +13,34 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
-    imports=['app.tasks.document'],
+    imports=['app.tasks.runtime', 'app.tasks.document', 'app.tasks.pipeline', 'app.tasks.question_answer', 'app.tasks.collections'],
+    # Ingestion tasks are long and uneven; a low prefetch keeps one slow file
+    # from holding back the small ones queued behind it
+    worker_prefetch_multiplier=settings.CELERY_PREFETCH_MULTIPLIER,
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    worker_max_tasks_per_child=settings.CELERY_MAX_TASKS_PER_CHILD,
+    task_acks_late=settings.CELERY_ACKS_LATE,
+    task_reject_on_worker_lost=settings.CELERY_ACKS_LATE,
+    broker_transport_options={'visibility_timeout': settings.CELERY_VISIBILITY_TIMEOUT},
 )
 
 celery_app.conf.task_routes = {
-    'app.tasks.document.process_document': {'queue': 'document_processing'}
+    'app.tasks.document.process_document': {'queue': 'document_processing'},
+    'app.tasks.pipeline.partition_document': {'queue': 'ingest_partition'},
+    'app.tasks.pipeline.chunk_document': {'queue': 'ingest_chunk'},
+    'app.tasks.pipeline.enrich_document': {'queue': 'ingest_enrich'},
+    'app.tasks.pipeline.embed_document': {'queue': 'ingest_embed'},
+    'app.tasks.pipeline.write_document': {'queue': 'ingest_write'},
+    'app.tasks.question_answer.merge_question_answers': {'queue': 'qa_merges'},
+    'app.tasks.question_answer.merge_pending_questions': {'queue': 'qa_merges'},
+    'app.tasks.question_answer.compact_question_answers': {'queue': 'qa_merges'},
+    'app.tasks.question_answer.schedule_question_compaction': {'queue': 'qa_merges'},
+    'app.tasks.collections.migrate_organization_collections': {'queue': 'collection_migrations'},
+}
+
+celery_app.conf.beat_schedule = {
+    'compact-question-answers': {
+        'task': 'app.tasks.question_answer.schedule_question_compaction',
+        'schedule': settings.QA_COMPACTION_INTERVAL_SECONDS,
+    },
 }
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     APP_NAME: str = "Knowledge Intelligence"
@@ -11,6 +12,108 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     COHERE_API_KEY: str = "Your Cohere API Key"
+    CHROMA_HEALTH_CHECK_INTERVAL: float = 30.0
+    # Connection pool of the shared Chroma client (httpx limits); size it
+    # above BLOCKING_EXECUTOR_WORKERS so worker threads never queue for one
+    CHROMA_HTTP_MAX_CONNECTIONS: int = 100
+    CHROMA_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 40
+    CHROMA_HTTP_KEEPALIVE_SECONDS: float = 40.0
+    BLOCKING_EXECUTOR_WORKERS: int = 32
+    REDIS_CACHE_DB: int = 1
+    CELERY_REDIS_DB: int = 0
+    CELERY_WORKER_CONCURRENCY: Optional[int] = None  # defaults to the number of CPUs
+    CELERY_PREFETCH_MULTIPLIER: int = 1
+    CELERY_ACKS_LATE: bool = True
+    CELERY_MAX_TASKS_PER_CHILD: Optional[int] = None
+    # Must exceed the longest task when acks are late, or Redis redelivers it
+    CELERY_VISIBILITY_TIMEOUT: int = 2 * 3600
+    # Squared L2 distance between normalized embeddings under which two QA
+    # pairs count as duplicates (same threshold as single adds)
+    QA_DUPLICATE_DISTANCE: float = 0.25
+    QA_BULK_MAX_ITEMS: int = 20000
+    QA_BULK_QUERY_BATCH_SIZE: int = 100
+    # Near-duplicates of one entry arriving within this window share one merge
+    QA_MERGE_DELAY_SECONDS: int = 30
+    QA_MERGE_RECORD_TTL_SECONDS: int = 24 * 3600
+    # Per-entry merge lock: held for one LLM merge, waited on by the next one
+    QA_MERGE_LOCK_SECONDS: int = 300
+    QA_MERGE_LOCK_WAIT_SECONDS: int = 120
+    QA_COMPACTION_INTERVAL_SECONDS: int = 24 * 3600
+    QA_COMPACTION_DISTANCE: float = 0.25
+    QA_COMPACTION_MAX_CLUSTER_SIZE: int = 20
+    QA_COMPACTION_CONCURRENCY: int = 4
+    QA_COMPACTION_PAGE_SIZE: int = 1000
+    ORG_VALIDATION_ENABLED: bool = True
+    ORG_REGISTRY_TTL_SECONDS: int = 300
+    ORG_NEGATIVE_CACHE_SECONDS: int = 30
+    # "shared" keeps every organization in the documents/questions_answers
+    # collections; "per_organization" gives new organizations their own
+    # collections. Existing ones move over with the collection migration task.
+    COLLECTION_LAYOUT: str = "shared"
+    COLLECTION_STATE_CACHE_SECONDS: int = 5
+    COLLECTION_MIGRATION_PAGE_SIZE: int = 500
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 50000
+    EMBEDDING_CACHE_BACKEND: str = "redis"  # "redis", "disk" or "none"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1000000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    EMBEDDING_CACHE_DISK_PATH: str = "cache/embeddings.sqlite3"
+    # "memory" only sees invalidations made in the same process; use "redis"
+    # when documents are ingested by Celery workers.
+    ANSWER_CACHE_BACKEND: str = "redis"  # "redis", "memory" or "none"
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES_PER_ORG: int = 500
+    RERANKER_BACKEND: str = "cohere"  # "cohere" or "lexical"
+    RERANKER_ORGANIZATION_BACKENDS: Dict[str, str] = {}
+    RERANKER_MEMO_ENTRIES: int = 10000
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_RRF_K: int = 60
+    DOCUMENT_RERANK_CANDIDATES: int = 6
+    LEXICAL_INDEX_PAGE_SIZE: int = 1000
+    # Changes kept per organization for other processes to replay; a process
+    # that falls further behind rebuilds its index from Chroma
+    LEXICAL_INDEX_CHANGE_LOG_SIZE: int = 10000
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_MULTIPART_OVERHEAD_BYTES: int = 64 * 1024
+    UPLOAD_DIR: Optional[str] = None
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_BATCH_RETRIES: int = 3
+    EMBEDDING_RETRY_BACKOFF_SECONDS: float = 1.0
+    INGESTION_PIPELINE_ENABLED: bool = True
+    INGESTION_CHECKPOINT_DIR: str = "checkpoints/ingestion"
+    INGESTION_STAGE_MAX_RETRIES: int = 3
+    KEYWORD_SECTION_CHARS: int = 30000
+    KEYWORD_MAX_CONCURRENCY: int = 4
+    # Embed chunks together with the document topics prefix, as chunks have
+    # always been embedded. Turning this off lets embedding run alongside
+    # topic extraction, but the chunks already stored were embedded with the
+    # prefix: re-embed them first or one collection mixes two kinds of vectors.
+    EMBED_CHUNK_TOPICS: bool = True
+    # "reembed" embeds every finished chunk; "derive" averages the sentence
+    # embeddings the semantic chunker already computed (no extra API calls)
+    CHUNK_EMBEDDING_MODE: str = "reembed"
+    # "local" loads in-process, "api" uses the Unstructured API, "auto" (PDF
+    # only) loads locally when the text layer is usable. Unlisted: "api".
+    PARTITION_STRATEGY_BY_EXTENSION: Dict[str, str] = {
+        ".txt": "local",
+        ".md": "local",
+        ".csv": "local",
+        ".pdf": "auto",
+    }
+    PDF_MIN_CHARS_PER_PAGE: int = 200
+    # Size of the elements handed to the chunker: the API's by_title chunks,
+    # and groups of consecutive local elements such as CSV rows
+    PARTITION_MAX_CHARACTERS: int = 5000
+    BULK_UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    BULK_UPLOAD_MAX_FILES: int = 5000
+    # Caps on what a bulk request's zip archives may extract to disk
+    BULK_EXTRACT_MAX_BYTES: int = 10 * 1024 * 1024 * 1024
+    BULK_EXTRACT_MAX_RATIO: int = 100
+    BULK_MAX_CONCURRENCY: int = 8
+    BULK_BATCH_TTL_SECONDS: int = 7 * 24 * 3600
 
     class Config:
         env_file = ".env"
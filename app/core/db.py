@@ -1,44 +1,170 @@
 # ./information-generation/app/core/db.py
 
 from chromadb import HttpClient
+from chromadb.config import Settings as ChromaSettings
+from langchain_chroma import Chroma
 from app.core.config import settings
-from contextlib import contextmanager
+import httpx
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Errors meaning the connection to Chroma broke, not that a request was rejected
+CONNECTION_ERRORS = (ConnectionError, httpx.TransportError)
+
+
+class _Reconnecting:
+    """Proxy for a collection or vector store built on the shared client.
+
+    A call that fails with a connection error replaces the client, rebuilds
+    the wrapped object on the new one and is retried once, so a dropped
+    connection costs one retry instead of failing every request until the
+    next heartbeat check.
+    """
+
+    def __init__(self, manager, build):
+        self._manager = manager
+        self._build = build
+        self._client, self._target = build()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            try:
+                return getattr(self._target, name)(*args, **kwargs)
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"ChromeDB connection error in {name}, reconnecting: {str(e)}")
+                self._manager.reconnect(self._client)
+                self._client, self._target = self._build()
+                return getattr(self._target, name)(*args, **kwargs)
+
+        return call
+
+
 class DatabaseManager:
+    """Single long-lived Chroma HTTP client shared by the whole process.
+
+    Collections and LangChain vector stores are cached on top of that one
+    client so their HTTP connections stay alive; the client's httpx
+    connection pool, sized by the ``CHROMA_HTTP_*`` settings, handles
+    concurrent requests from coroutines and worker threads. The client is
+    replaced together with everything cached on it when a call through a
+    cached object hits a connection error, or when it fails the heartbeat
+    check made on first use after ``CHROMA_HEALTH_CHECK_INTERVAL`` idle.
+    """
+
     _instance = None
+    _instance_lock = threading.Lock()
 
     def __init__(self):
         self.client = None
+        self._lock = threading.Lock()
+        self._last_checked = 0.0
+        self._vector_stores = {}
 
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
-            cls._instance = DatabaseManager()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = DatabaseManager()
         return cls._instance
 
+    def _create_client(self):
+        try:
+            client = HttpClient(
+                host=settings.CHROME_DB_URI,
+                settings=ChromaSettings(
+                    chroma_http_max_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS,
+                    chroma_http_max_keepalive_connections=settings.CHROMA_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    chroma_http_keepalive_secs=settings.CHROMA_HTTP_KEEPALIVE_SECONDS,
+                ),
+            )
+        except Exception as e:
+            logger.error(f"Failed to connect to ChromeDB: {str(e)}")
+            raise
+        self._last_checked = time.monotonic()
+        return client
+
+    def _is_healthy(self, client) -> bool:
+        if time.monotonic() - self._last_checked < settings.CHROMA_HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            client.heartbeat()
+        except Exception as e:
+            logger.warning(f"ChromeDB client failed health check: {str(e)}")
+            return False
+        self._last_checked = time.monotonic()
+        return True
+
     def connect(self):
-        if self.client is None:
-            try:
-                self.client = HttpClient(host=settings.CHROME_DB_URI)
+        """Create the shared client used by cached vector stores and collections."""
+        with self._lock:
+            if self.client is None:
+                self.client = self._create_client()
                 logger.info("Connected to ChromeDB")
-            except Exception as e:
-                logger.error(f"Failed to connect to ChromeDB: {str(e)}")
-                raise
 
     def disconnect(self):
-        if self.client:
+        with self._lock:
             self.client = None
-            logger.info("Disconnected from ChromeDB")
+            self._vector_stores.clear()
+        logger.info("Disconnected from ChromeDB")
 
-    @contextmanager
-    def get_client(self):
+    def reconnect(self, failed_client=None):
+        """Replace the shared client. With ``failed_client`` given, only if it
+        is still the current one, so concurrent failures reconnect once."""
+        with self._lock:
+            if failed_client is not None and self.client is not failed_client:
+                return
+            self.client = None
+            self._vector_stores.clear()
         self.connect()
-        try:
-            yield self.client
-        finally:
-            self.disconnect()
 
-db_manager = DatabaseManager.get_instance()
\ No newline at end of file
+    def _shared_client(self):
+        client = self.client
+        if client is None:
+            self.connect()
+        elif not self._is_healthy(client):
+            logger.info("Reconnecting shared ChromeDB client")
+            self.reconnect(client)
+        return self.client
+
+    def _cached(self, key, build):
+        proxy = self._vector_stores.get(key)
+        if proxy is None:
+            with self._lock:
+                proxy = self._vector_stores.get(key)
+            if proxy is None:
+                proxy = _Reconnecting(self, build)
+                with self._lock:
+                    proxy = self._vector_stores.setdefault(key, proxy)
+        return proxy
+
+    def get_vector_store(self, collection_name: str, embedding_function) -> Chroma:
+        """Return a cached LangChain ``Chroma`` wrapper for ``collection_name``."""
+        def _build():
+            client = self._shared_client()
+            return client, Chroma(
+                client=client,
+                collection_name=collection_name,
+                embedding_function=embedding_function,
+            )
+
+        self._shared_client()
+        return self._cached((collection_name, id(embedding_function)), _build)
+
+    def get_collection(self, collection_name: str):
+        """Return the raw Chroma collection backing ``collection_name``."""
+        def _build():
+            client = self._shared_client()
+            return client, client.get_or_create_collection(collection_name)
+
+        self._shared_client()
+        return self._cached((collection_name, None), _build)
+
+db_manager = DatabaseManager.get_instance()
@@ -0,0 +1,58 @@
+# app/core/redis_client.py
+
+import threading
+import redis
+import redis.asyncio as redis_asyncio
+from app.core.config import settings
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis_url(db: int = None) -> str:
+    if db is None:
+        db = settings.REDIS_CACHE_DB
+    return f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{db}"
+
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide Redis client used for caches and shared state."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(get_redis_url())
+    return _client
+
+
+_async_clients = {}
+
+
+def get_async_redis(db: int = None) -> redis_asyncio.Redis:
+    """Return a shared asyncio Redis client for ``db`` (the cache db by default).
+
+    For use inside the API's event loop, where a blocking client would stall
+    every other request.
+    """
+    if db is None:
+        db = settings.REDIS_CACHE_DB
+    client = _async_clients.get(db)
+    if client is None:
+        client = redis_asyncio.Redis.from_url(get_redis_url(db))
+        _async_clients[db] = client
+    return client
+
+
+async def close_async_redis():
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.close()
+
+
+def reset_redis():
+    """Forget clients created before a fork; the child builds its own."""
+    global _client
+    with _client_lock:
+        _client = None
+    _async_clients.clear()
@@ -1,12 +1,16 @@
 import os
-from fastapi import FastAPI
-from app.api.routes import organization, document, question_answer, chat
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.api.routes import organization, document, question_answer, chat, cache
 from app.core.config import settings
 from app.core.logging_config import setup_logging
 from app.core.logging_config import logging
 from app.core.db import db_manager
 from app.core.exceptions import app_exception_handler, global_exception_handler, AppException
 from app.core.celery_app import celery_app
+from app.core.executor import shutdown_executor
+from app.core.redis_client import close_async_redis
+from app.services.registry import registry
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -17,23 +21,47 @@ app.include_router(organization.router, prefix="/api/v1")
 app.include_router(document.router, prefix="/api/v1")
 app.include_router(question_answer.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
+app.include_router(cache.router, prefix="/api/v1")
 
 app.add_exception_handler(AppException, app_exception_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Reject oversized uploads from Content-Length before the body is parsed;
+    # save_upload enforces the exact limit while streaming.
+    if request.method in ("POST", "PUT") and request.url.path.startswith("/api/v1/documents"):
+        content_length = request.headers.get("content-length")
+        max_bytes = (
+            settings.BULK_UPLOAD_MAX_BYTES
+            if request.url.path.startswith("/api/v1/documents/upload/bulk")
+            else settings.UPLOAD_MAX_BYTES
+        )
+        limit = max_bytes + settings.UPLOAD_MULTIPART_OVERHEAD_BYTES
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File exceeds the maximum upload size of {max_bytes} bytes"},
+            )
+    return await call_next(request)
+
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Starting {settings.APP_NAME}")
     try:
         os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
         db_manager.connect()
-        celery_app.conf.update(broker_url=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0")
+        registry.startup()
+        celery_app.conf.update(broker_url=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.CELERY_REDIS_DB}")
     except Exception as e:
         logger.error(f"Failed to connect to ChromeDB: {str(e)}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"Shutting down {settings.APP_NAME}")
+    registry.shutdown()
+    await close_async_redis()
+    shutdown_executor()
     db_manager.disconnect()
 
 @app.get("/")
@@ -21,12 +21,43 @@ class RelevantDocumentResponse(BaseModel):
     relevance_score: float
 
 class DocumentUploadResponse(BaseModel):
-    task_id: str
+    task_id: Optional[str] = None
+    message: str
+    source_document_id: Optional[str] = None
+    duplicate: bool = False
+
+class BulkUploadResponse(BaseModel):
+    batch_id: str
+    total: int
+    queued: int
+    duplicates: int
     message: str
 
+class BatchFileStatus(BaseModel):
+    task_id: str
+    file_name: str
+    source_document_id: Optional[str] = None
+    status: str
+    chunks: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    organization_id: str
+    status: str
+    total: int
+    duplicates: int
+    completed: int
+    failed: int
+    queued: int
+    in_progress: int
+    chunks_embedded: int
+    files: List[BatchFileStatus]
+
 class TaskStatusResponse(BaseModel):
+    state: str
     status: str
     current: int
     total: int
-    status: str
-    result: Optional[str] = None
+    stage: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
@@ -11,4 +11,15 @@ class OrganizationUpdate(BaseModel):
 
 class OrganizationResponse(BaseModel):
     name: str
-    description: str
\ No newline at end of file
+    description: str
+
+class OrganizationCollectionsResponse(BaseModel):
+    organization_id: str
+    layout: str
+    # "shared", "migrating", "cutover" or "sharded" for each collection kind
+    documents: str
+    questions_answers: str
+
+class CollectionMigrationQueuedResponse(BaseModel):
+    task_id: str
+    message: str
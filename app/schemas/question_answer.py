@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Union
+from typing import List, Optional, Union
 
 class QuestionAnswerCreate(BaseModel):
     question: str
@@ -15,4 +15,41 @@ class QuestionAnswerResponse(BaseModel):
     question: str
     answer: str
     organization_id: str
-    relevance_score: Union[float, None] = None
\ No newline at end of file
+    relevance_score: Union[float, None] = None
+    # Set when the pair duplicates an existing entry and is queued to be merged into it
+    merge_target: Optional[str] = None
+
+class QuestionAnswerBulkCreate(BaseModel):
+    items: List[QuestionAnswerCreate]
+
+class QuestionAnswerBulkResponse(BaseModel):
+    received: int
+    added: int
+    duplicates_in_batch: int
+    duplicates_of_existing: int
+    merges_queued: int
+    # Id of the stored entry each input item was added or merged into, in input order
+    ids: List[str]
+
+class QuestionMergeStateResponse(BaseModel):
+    question_id: str
+    # "pending": waiting to be merged into merge_target; "merged": already
+    # merged into merge_target; "none": no merge involving this entry as a source
+    status: str
+    merge_target: Optional[str] = None
+    # Pairs waiting to be merged into this entry
+    pending_merges: List[str] = []
+
+class QuestionCompactionReport(BaseModel):
+    organization_id: str
+    entries_before: int
+    entries_after: int
+    clusters: int
+    clusters_failed: int
+    entries_removed: int
+    shrink_ratio: float
+    completed_at: float
+
+class QuestionCompactionQueuedResponse(BaseModel):
+    task_id: str
+    message: str
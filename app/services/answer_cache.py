@@ -0,0 +1,291 @@
+# app/services/answer_cache.py
+
+import json
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _OrganizationAnswers:
+    """Query vectors cached for one organization, held as a dense matrix."""
+
+    def __init__(self, generation=None):
+        self.generation = generation
+        self.synced_until = 0.0
+        self.ids: List[str] = []
+        self.created_at: List[float] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.responses: Dict[str, dict] = {}
+
+    def add(self, entry_id: str, vector: np.ndarray, created_at: float, response: dict = None):
+        if self.matrix.size == 0:
+            self.matrix = vector.reshape(1, -1)
+        else:
+            self.matrix = np.vstack([self.matrix, vector])
+        self.ids.append(entry_id)
+        self.created_at.append(created_at)
+        if response is not None:
+            self.responses[entry_id] = response
+
+    def prune(self, ttl: float, max_entries: int):
+        cutoff = time.time() - ttl
+        keep = [i for i, created in enumerate(self.created_at) if created >= cutoff]
+        keep = keep[-max_entries:]
+        if len(keep) == len(self.ids):
+            return
+        dropped = set(self.ids) - {self.ids[i] for i in keep}
+        self.ids = [self.ids[i] for i in keep]
+        self.created_at = [self.created_at[i] for i in keep]
+        self.matrix = self.matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+        for entry_id in dropped:
+            self.responses.pop(entry_id, None)
+
+    def best_match(self, vector: np.ndarray):
+        if not self.ids:
+            return None, 0.0
+        scores = self.matrix @ vector
+        idx = int(np.argmax(scores))
+        return self.ids[idx], float(scores[idx])
+
+
+class InMemoryAnswerStore:
+    """Answer entries kept inside this process only."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._orgs: Dict[str, _OrganizationAnswers] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, organization_id: str):
+        return self._generations.get(organization_id, 0)
+
+    def get(self, organization_id: str, vector: np.ndarray):
+        with self._lock:
+            answers = self._orgs.get(organization_id)
+            if answers is None:
+                return None, 0.0
+            answers.prune(self.ttl, self.max_entries)
+            entry_id, score = answers.best_match(vector)
+            return (answers.responses.get(entry_id) if entry_id else None), score
+
+    def put(self, organization_id: str, vector: np.ndarray, response: dict, generation):
+        with self._lock:
+            if generation != self.generation(organization_id):
+                return
+            answers = self._orgs.setdefault(organization_id, _OrganizationAnswers())
+            answers.add(str(uuid.uuid4()), vector, time.time(), response)
+            answers.prune(self.ttl, self.max_entries)
+
+    def invalidate(self, organization_id: str):
+        with self._lock:
+            self._generations[organization_id] = self.generation(organization_id) + 1
+            self._orgs.pop(organization_id, None)
+
+
+class RedisAnswerStore:
+    """Answer entries shared through Redis, mirrored locally for matching.
+
+    Each process keeps a local matrix of the org's cached query vectors and
+    only pulls entries added since its last sync. Invalidation bumps a
+    per-organization generation counter, which makes every mirror reset.
+    Writes check the generation and store the entry in one Lua script, so
+    an invalidation can never land between the two.
+    """
+
+    # KEYS: generation, ids, vectors, responses
+    # ARGV: generation, entry id, vector, response, now, ttl, max entries
+    _PUT = """
+if (redis.call('get', KEYS[1]) or '0') ~= ARGV[1] then return 0 end
+redis.call('hset', KEYS[3], ARGV[2], ARGV[3])
+redis.call('hset', KEYS[4], ARGV[2], ARGV[4])
+redis.call('zadd', KEYS[2], ARGV[5], ARGV[2])
+local stale = redis.call('zrangebyscore', KEYS[2], '-inf', tonumber(ARGV[5]) - tonumber(ARGV[6]))
+local overflow = redis.call('zcard', KEYS[2]) - #stale - tonumber(ARGV[7])
+if overflow > 0 then
+    for _, entry in ipairs(redis.call('zrange', KEYS[2], #stale, #stale + overflow - 1)) do
+        table.insert(stale, entry)
+    end
+end
+for _, entry in ipairs(stale) do
+    redis.call('zrem', KEYS[2], entry)
+    redis.call('hdel', KEYS[3], entry)
+    redis.call('hdel', KEYS[4], entry)
+end
+for i = 2, 4 do redis.call('expire', KEYS[i], ARGV[6]) end
+return 1
+"""
+
+    def __init__(self, ttl: float, max_entries: int, prefix: str = "answercache"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._orgs: Dict[str, _OrganizationAnswers] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, organization_id: str, name: str) -> str:
+        return f"{self.prefix}:{organization_id}:{name}"
+
+    def generation(self, organization_id: str):
+        return get_redis().get(self._key(organization_id, "generation")) or b"0"
+
+    def _sync(self, organization_id: str) -> _OrganizationAnswers:
+        client = get_redis()
+        generation = self.generation(organization_id)
+        answers = self._orgs.get(organization_id)
+        if answers is None or answers.generation != generation:
+            answers = _OrganizationAnswers(generation)
+            self._orgs[organization_id] = answers
+
+        new_entries = client.zrangebyscore(
+            self._key(organization_id, "ids"),
+            f"({max(answers.synced_until, time.time() - self.ttl)}",
+            "+inf",
+            withscores=True,
+        )
+        if new_entries:
+            ids = [entry_id.decode() for entry_id, _ in new_entries]
+            vectors = client.hmget(self._key(organization_id, "vectors"), ids)
+            for entry_id, (_, created_at), data in zip(ids, new_entries, vectors):
+                if data is not None:
+                    answers.add(entry_id, np.frombuffer(data, dtype=np.float32), created_at)
+            answers.synced_until = new_entries[-1][1]
+        answers.prune(self.ttl, self.max_entries)
+        return answers
+
+    def get(self, organization_id: str, vector: np.ndarray):
+        with self._lock:
+            answers = self._sync(organization_id)
+            entry_id, score = answers.best_match(vector)
+        if entry_id is None:
+            return None, score
+        data = get_redis().hget(self._key(organization_id, "responses"), entry_id)
+        return (json.loads(data) if data else None), score
+
+    def put(self, organization_id: str, vector: np.ndarray, response: dict, generation):
+        # Expired entries are dropped and the set trimmed to the
+        # per-organization bound in the same script
+        get_redis().eval(
+            self._PUT,
+            4,
+            self._key(organization_id, "generation"),
+            self._key(organization_id, "ids"),
+            self._key(organization_id, "vectors"),
+            self._key(organization_id, "responses"),
+            generation,
+            str(uuid.uuid4()),
+            vector.astype(np.float32).tobytes(),
+            json.dumps(response),
+            time.time(),
+            int(self.ttl),
+            self.max_entries,
+        )
+
+    def invalidate(self, organization_id: str):
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.incr(self._key(organization_id, "generation"))
+        pipe.delete(
+            self._key(organization_id, "ids"),
+            self._key(organization_id, "vectors"),
+            self._key(organization_id, "responses"),
+        )
+        pipe.execute()
+        with self._lock:
+            self._orgs.pop(organization_id, None)
+
+
+class AnswerCache:
+    """Per-organization semantic cache of chat answers.
+
+    A cached answer is returned when the cosine similarity between the new
+    query embedding and a cached query embedding reaches ``threshold``.
+    Writes to an organization's documents or QA pairs must call
+    ``invalidate`` for that organization.
+    """
+
+    def __init__(self, store, threshold: float = None):
+        self.store = store
+        self.threshold = threshold if threshold is not None else settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation(self, organization_id: str):
+        """Token to pass back to ``store_answer`` so answers computed before an
+        invalidation are not written after it."""
+        try:
+            return self.store.generation(organization_id)
+        except Exception as e:
+            logger.warning(f"Answer cache generation lookup failed: {str(e)}")
+            return None
+
+    def lookup(self, organization_id: str, query_embedding: List[float]) -> Optional[dict]:
+        try:
+            response, score = self.store.get(organization_id, _normalize(query_embedding))
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {str(e)}")
+            response, score = None, 0.0
+
+        with self._lock:
+            if response is not None and score >= self.threshold:
+                self.hits += 1
+                logger.info(f"Answer cache hit for {organization_id} (similarity {score:.3f})")
+                return response
+            self.misses += 1
+        return None
+
+    def store_answer(self, organization_id: str, query_embedding: List[float], response: dict, generation):
+        # Without a generation there is no telling whether an invalidation
+        # happened since the answer was computed
+        if generation is None:
+            return
+        try:
+            self.store.put(organization_id, _normalize(query_embedding), response, generation)
+        except Exception as e:
+            logger.warning(f"Answer cache write failed: {str(e)}")
+
+    def invalidate(self, organization_id: str):
+        try:
+            self.store.invalidate(organization_id)
+            with self._lock:
+                self.invalidations += 1
+            logger.info(f"Invalidated answer cache for {organization_id}")
+        except Exception as e:
+            logger.warning(f"Answer cache invalidation failed for {organization_id}: {str(e)}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    backend = settings.ANSWER_CACHE_BACKEND
+    ttl = settings.ANSWER_CACHE_TTL_SECONDS
+    max_entries = settings.ANSWER_CACHE_MAX_ENTRIES_PER_ORG
+    if backend == "memory":
+        return AnswerCache(InMemoryAnswerStore(ttl, max_entries))
+    if backend == "redis":
+        return AnswerCache(RedisAnswerStore(ttl, max_entries))
+    return None
@@ -0,0 +1,52 @@
+# app/services/batch_embedding.py
+
+import asyncio
+from typing import Callable, List, Optional
+from app.core.config import settings
+from app.core.executor import run_blocking
+from app.core.logging_config import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def with_retries(description: str, func, *args, **kwargs):
+    """Run a blocking call, retrying with exponential backoff on failure."""
+    attempts = max(1, settings.EMBEDDING_BATCH_RETRIES)
+    for attempt in range(1, attempts + 1):
+        try:
+            return await run_blocking(func, *args, **kwargs)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = settings.EMBEDDING_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            logger.warning(f"{description} failed (attempt {attempt}/{attempts}), retrying in {delay}s: {str(e)}")
+            await asyncio.sleep(delay)
+
+
+async def embed_batch(embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed one batch, retrying with exponential backoff on failure."""
+    return await with_retries("Embedding batch", embeddings.embed_documents, texts)
+
+
+async def embed_in_batches(
+    embeddings,
+    texts: List[str],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> List[List[float]]:
+    """Embed ``texts`` in ``EMBEDDING_BATCH_SIZE`` batches, at most
+    ``EMBEDDING_MAX_CONCURRENCY`` at a time, keeping the input order."""
+    batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_MAX_CONCURRENCY))
+    done = 0
+
+    async def _process_batch(start: int):
+        nonlocal done
+        async with semaphore:
+            vectors = await embed_batch(embeddings, texts[start:start + batch_size])
+        done += len(vectors)
+        if on_progress is not None:
+            on_progress(done, len(texts))
+        return vectors
+
+    batches = await asyncio.gather(*(_process_batch(start) for start in range(0, len(texts), batch_size)))
+    return [vector for batch in batches for vector in batch]
@@ -1,98 +1,176 @@
 # app/services/chat.py
 
-from app.services.document_ingestion import DocumentIngestionService
 from app.services.question_answer import QuestionAnswerService
 from app.services.vector_db import VectorDBService
 from app.schemas.chat import ChatRequest, ChatResponse
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_cohere import CohereRerank
+from app.services.reranker import create_reranker
 from app.core.config import settings
 from app.core.logging_config import logging
+from app.core.executor import run_blocking
+from langchain.schema import Document
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import asyncio
 import os
 
 logger = logging.getLogger(__name__)
 
 class ChatService:
-    def __init__(self):
+    def __init__(self, qa_service=None, vector_db_service=None, llm=None, reranker=None, embeddings=None, answer_cache=None):
         os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
         os.environ["COHERE_API_KEY"] = settings.COHERE_API_KEY
-        self.document_service = DocumentIngestionService()
-        self.qa_service = QuestionAnswerService()
-        self.vector_db_service = VectorDBService()
-        self.llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
-        self.reranker = CohereRerank(model="rerank-english-v2.0")
+        self.qa_service = qa_service or QuestionAnswerService()
+        self.vector_db_service = vector_db_service or VectorDBService()
+        self.llm = llm or ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+        self.reranker = reranker or create_reranker()
+        self.embeddings = embeddings or self.vector_db_service.embeddings
+        self.answer_cache = answer_cache
 
     async def generate_response(self, chat_request: ChatRequest) -> ChatResponse:
         try:
-            # Fetch relevant documents
-            relevant_docs = await self.vector_db_service.search_documents(
-                chat_request.organization_id,
-                chat_request.query,
-                k=10  # Increase to 10 for better reranking
-            )
-
-            # Rerank documents
-            reranked_docs = self._rerank_documents(chat_request.query, relevant_docs)
+            query_embedding = await self.embed_query(chat_request.query)
+            cached, generation = await self._lookup_cached_answer(chat_request.organization_id, query_embedding)
+            if cached is not None:
+                return ChatResponse(**cached)
 
-            # Fetch relevant questions
-            relevant_questions = await self.qa_service.get_relevant_questions(
-                chat_request
-            )
-
-            # Prepare context for the LLM
-            context = self._prepare_context(reranked_docs, relevant_questions)
-            logger.info(f"Prepared context: {context}")
+            reranked_docs, relevant_questions = await self.retrieve_context(chat_request, query_embedding)
+            prompt = self._build_prompt(chat_request.query, reranked_docs, relevant_questions)
 
             # Generate response using LLM
-            prompt = f"""You are an AI assistant. Use the following context to answer the user's question. If you cannot find a relevant answer in the context, say so politely.
-
-Context:
-{context}
-
-User's question: {chat_request.query}
-
-Please provide a concise and relevant answer:"""
+            response = await self.llm.ainvoke(prompt)
+            response_str = self._content_to_str(response.content)
 
-            response = self.llm.invoke(prompt)
-            response_str = ''
-            if isinstance(response.content, str):
-                response_str = response.content
-            elif isinstance(response.content, list):
-                response_str = ", ".join([str(item) for item in response.content if isinstance(item, str)])
-            else:
-                response_str = str(response.content)
-
-            return ChatResponse(
+            chat_response = ChatResponse(
                 answer=response_str,
                 relevant_docs=[doc.page_content for doc in reranked_docs],
                 relevant_questions=[q.page_content for q in relevant_questions]
             )
+            await self._store_cached_answer(chat_request.organization_id, query_embedding, chat_response, generation)
+            return chat_response
 
         except Exception as e:
             logger.error(f"Error generating chat response: {str(e)}")
             raise
 
-    def _rerank_documents(self, query, docs):
+    async def stream_response(self, chat_request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a ``context`` event once retrieval finishes, then ``token`` events
+        as the LLM produces them, and finally a ``done`` event with the full answer."""
+        query_embedding = await self.embed_query(chat_request.query)
+        cached, generation = await self._lookup_cached_answer(chat_request.organization_id, query_embedding)
+        if cached is not None:
+            yield {
+                "event": "context",
+                "data": {
+                    "relevant_docs": cached["relevant_docs"],
+                    "relevant_questions": cached["relevant_questions"],
+                },
+            }
+            yield {"event": "token", "data": {"text": cached["answer"]}}
+            yield {"event": "done", "data": {"answer": cached["answer"]}}
+            return
+
+        reranked_docs, relevant_questions = await self.retrieve_context(chat_request, query_embedding)
+        yield {
+            "event": "context",
+            "data": {
+                "relevant_docs": [doc.page_content for doc in reranked_docs],
+                "relevant_questions": [q.page_content for q in relevant_questions],
+            },
+        }
+
+        prompt = self._build_prompt(chat_request.query, reranked_docs, relevant_questions)
+        answer_parts = []
+        async for chunk in self.llm.astream(prompt):
+            text = self._content_to_str(chunk.content, separator="")
+            if not text:
+                continue
+            answer_parts.append(text)
+            yield {"event": "token", "data": {"text": text}}
+
+        answer = "".join(answer_parts)
+        await self._store_cached_answer(
+            chat_request.organization_id,
+            query_embedding,
+            ChatResponse(
+                answer=answer,
+                relevant_docs=[doc.page_content for doc in reranked_docs],
+                relevant_questions=[q.page_content for q in relevant_questions],
+            ),
+            generation,
+        )
+        yield {"event": "done", "data": {"answer": answer}}
+
+    async def embed_query(self, query: str) -> List[float]:
+        return await run_blocking(self.embeddings.embed_query, query)
+
+    async def _lookup_cached_answer(self, organization_id: str, query_embedding: List[float]):
+        if self.answer_cache is None:
+            return None, None
+        generation = await run_blocking(self.answer_cache.generation, organization_id)
+        cached = await run_blocking(self.answer_cache.lookup, organization_id, query_embedding)
+        return cached, generation
+
+    async def _store_cached_answer(self, organization_id: str, query_embedding: List[float], response: ChatResponse, generation):
+        if self.answer_cache is None:
+            return
+        await run_blocking(self.answer_cache.store_answer, organization_id, query_embedding, response.dict(), generation)
+
+    async def retrieve_context(self, chat_request: ChatRequest, query_embedding: List[float] = None) -> Tuple[List[Document], List[Document]]:
+        # Embed the query once and use the vector for both collections
+        if query_embedding is None:
+            query_embedding = await self.embed_query(chat_request.query)
+
+        # Fetch and rerank documents while the QA lookup runs alongside
+        reranked_docs, relevant_questions = await asyncio.gather(
+            self._retrieve_documents(chat_request, query_embedding),
+            self.qa_service.get_relevant_questions_by_vector(chat_request, query_embedding),
+        )
+        return reranked_docs, relevant_questions
+
+    def _build_prompt(self, query: str, docs, questions) -> str:
+        # Prepare context for the LLM
+        context = self._prepare_context(docs, questions)
+        logger.info(f"Prepared context: {context}")
+
+        return f"""You are an AI assistant. Use the following context to answer the user's question. If you cannot find a relevant answer in the context, say so politely.
+
+Context:
+{context}
+
+User's question: {query}
+
+Please provide a concise and relevant answer:"""
+
+    def _content_to_str(self, content, separator: str = ", ") -> str:
+        if isinstance(content, str):
+            return content
+        elif isinstance(content, list):
+            return separator.join([str(item) for item in content if isinstance(item, str)])
+        else:
+            return str(content)
+
+    async def _retrieve_documents(self, chat_request: ChatRequest, query_embedding: List[float]):
+        relevant_docs = await self.vector_db_service.search_documents_by_vector(
+            chat_request.organization_id,
+            query_embedding,
+            k=settings.DOCUMENT_RERANK_CANDIDATES,
+            query=chat_request.query,
+        )
+        if not relevant_docs:
+            return []
+        return await run_blocking(
+            self._rerank_documents, chat_request.query, relevant_docs, chat_request.organization_id
+        )
+
+    def _rerank_documents(self, query, docs, organization_id=None):
         try:
-            documents = [doc.page_content for doc in docs]
-            reranked_results = self.reranker.rerank(
-                documents=documents,
-                query=query,
-                top_n=5  # Return top 5 most relevant results
+            return self.reranker.rerank_documents(
+                query,
+                docs,
+                top_n=5,  # Return top 5 most relevant results
+                threshold=0.20,
+                organization_id=organization_id,
             )
-
-            reranked_docs = []
-            for item in reranked_results:
-                idx = item.get('index')
-                relevance_score = item.get('relevance_score')
-                if idx is None or relevance_score is None:
-                    continue
-                doc = docs[idx]
-                doc.metadata['relevance_score'] = relevance_score
-                if relevance_score > 0.20:
-                    reranked_docs.append(doc)
-
-            return reranked_docs
         except Exception as e:
             logger.error(f"Error in document reranking: {str(e)}")
             return docs  # Return original docs if reranking fails
@@ -0,0 +1,252 @@
+# app/services/collection_router.py
+
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.db import db_manager
+from app.core.logging_config import logging
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SHARED = "shared"
+MIGRATING = "migrating"
+CUTOVER = "cutover"
+SHARDED = "sharded"
+
+
+class CollectionRouter:
+    """Maps an organization to the Chroma collection holding its entries.
+
+    Organizations start out in the shared ``base_name`` collection, where
+    queries are filtered by ``organization_id``. A sharded organization has
+    its own ``{base_name}__{organization_id}`` collection, so its index only
+    holds its own vectors. Each organization's state lives in the Redis hash
+    ``collections:{base_name}`` (absent means shared) and is cached locally
+    for ``COLLECTION_STATE_CACHE_SECONDS``.
+
+    With ``COLLECTION_LAYOUT = "per_organization"`` an organization with
+    nothing in the shared collection is sharded on its first write. Existing
+    organizations are moved by ``migrate``: while an organization is
+    migrating, writes go to both collections and reads stay on the shared
+    one; during cutover reads move to its own collection while writes still
+    reach both.
+    """
+
+    def __init__(self, base_name: str, prefix: str = "collections"):
+        self.base_name = base_name
+        self.prefix = prefix
+        self._states: Dict[str, Tuple[float, str]] = {}
+        self._has_shared_entries: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _key(self) -> str:
+        return f"{self.prefix}:{self.base_name}"
+
+    def collection_name(self, organization_id: str) -> str:
+        """Name of the organization's own collection."""
+        name = f"{self.base_name}__{organization_id}"
+        if len(name) > 63:
+            # Chroma caps collection names at 63 characters
+            name = f"{self.base_name[:40]}__{hashlib.sha1(organization_id.encode()).hexdigest()[:16]}"
+        return name
+
+    def state(self, organization_id: str, fresh: bool = False) -> str:
+        cached = self._states.get(organization_id)
+        now = time.monotonic()
+        if not fresh and cached is not None and now - cached[0] < settings.COLLECTION_STATE_CACHE_SECONDS:
+            return cached[1]
+        try:
+            value = get_redis().hget(self._key(), organization_id)
+        except Exception as e:
+            logger.warning(f"Collection state lookup failed for {organization_id}: {str(e)}")
+            return cached[1] if cached is not None else SHARED
+        state = value.decode() if value else SHARED
+        with self._lock:
+            self._states[organization_id] = (now, state)
+        return state
+
+    def _set_state(self, organization_id: str, state: str):
+        get_redis().hset(self._key(), organization_id, state)
+        with self._lock:
+            self._states[organization_id] = (time.monotonic(), state)
+
+    def states(self) -> Dict[str, str]:
+        """State of every organization that is not in the shared collection."""
+        return {org.decode(): state.decode() for org, state in get_redis().hgetall(self._key()).items()}
+
+    def _shard_new_organization(self, organization_id: str) -> bool:
+        """Give an organization with no shared entries its own collection."""
+        if organization_id in self._has_shared_entries:
+            return False
+        shared = db_manager.get_collection(self.base_name)
+        if shared.get(where={"organization_id": organization_id}, include=[], limit=1)["ids"]:
+            # Stays shared until migrated; remembered so writes skip this check
+            self._has_shared_entries.add(organization_id)
+            return False
+        get_redis().hsetnx(self._key(), organization_id, SHARDED)
+        return self.state(organization_id, fresh=True) == SHARDED
+
+    def read_name(self, organization_id: str) -> str:
+        if self.state(organization_id) in (SHARDED, CUTOVER):
+            return self.collection_name(organization_id)
+        return self.base_name
+
+    def write_names(self, organization_id: str) -> List[str]:
+        state = self.state(organization_id)
+        if (
+            state == SHARED
+            and settings.COLLECTION_LAYOUT == "per_organization"
+            and self._shard_new_organization(organization_id)
+        ):
+            state = SHARDED
+        if state == SHARDED:
+            return [self.collection_name(organization_id)]
+        if state in (MIGRATING, CUTOVER):
+            return [self.base_name, self.collection_name(organization_id)]
+        return [self.base_name]
+
+    def read_collection(self, organization_id: str):
+        return db_manager.get_collection(self.read_name(organization_id))
+
+    def write_collections(self, organization_id: str) -> list:
+        return [db_manager.get_collection(name) for name in self.write_names(organization_id)]
+
+    def lookup_names(self, organization_id: Optional[str] = None) -> List[str]:
+        """Collections to search for an id; every collection when the organization is unknown."""
+        if organization_id:
+            return [self.read_name(organization_id)]
+        sharded = [org for org, state in self.states().items() if state in (SHARDED, CUTOVER)]
+        return [self.base_name, *(self.collection_name(org) for org in sharded)]
+
+    # Migration
+
+    def lock_migration(self, organization_id: str, ttl: int) -> bool:
+        return bool(get_redis().set(f"{self._key()}:{organization_id}:migration", 1, nx=True, ex=ttl))
+
+    def unlock_migration(self, organization_id: str):
+        get_redis().delete(f"{self._key()}:{organization_id}:migration")
+
+    def _ids(self, collection, organization_id: str) -> List[str]:
+        """Every id the organization has in ``collection``, in one read.
+
+        Offset paging would skip rows when merges or deletes remove entries
+        mid-scan, so the id list is taken up front and rows are read by id.
+        """
+        return collection.get(where={"organization_id": organization_id}, include=[])["ids"]
+
+    @staticmethod
+    def _batches(ids: List[str]):
+        batch_size = settings.COLLECTION_MIGRATION_PAGE_SIZE
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+
+    @staticmethod
+    def _copy_ids(source, target, ids: List[str]) -> int:
+        rows = source.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+        if rows["ids"]:
+            target.upsert(
+                ids=rows["ids"],
+                embeddings=rows["embeddings"],
+                documents=rows["documents"],
+                metadatas=rows["metadatas"],
+            )
+        return len(rows["ids"])
+
+    def _copy(self, source, target, organization_id: str) -> int:
+        """Copy entries with their stored vectors. Entries already in the
+        target came from dual writes and are newer, so they are kept."""
+        copied = 0
+        for batch in self._batches(self._ids(source, organization_id)):
+            present = set(target.get(ids=batch, include=[])["ids"])
+            missing = [entry_id for entry_id in batch if entry_id not in present]
+            if missing:
+                copied += self._copy_ids(source, target, missing)
+        return copied
+
+    def _reconcile(self, source, target, organization_id: str) -> int:
+        """Make the target match the source: copy rows that are missing or
+        changed since they were copied, and drop rows deleted since."""
+        repaired = 0
+        source_ids = self._ids(source, organization_id)
+        for batch in self._batches(source_ids):
+            originals = source.get(ids=batch, include=["documents", "metadatas"])
+            copies = target.get(ids=batch, include=["documents", "metadatas"])
+            copied = {
+                entry_id: (document, metadata)
+                for entry_id, document, metadata in zip(copies["ids"], copies["documents"], copies["metadatas"])
+            }
+            stale = [
+                entry_id
+                for entry_id, document, metadata in zip(originals["ids"], originals["documents"], originals["metadatas"])
+                if copied.get(entry_id) != (document, metadata)
+            ]
+            if stale:
+                repaired += self._copy_ids(source, target, stale)
+
+        source_ids = set(source_ids)
+        orphans = [entry_id for entry_id in self._ids(target, organization_id) if entry_id not in source_ids]
+        for batch in self._batches(orphans):
+            # Re-check: the row may have been written to both after the snapshot
+            present = set(source.get(ids=batch, include=[])["ids"])
+            deleted = [entry_id for entry_id in batch if entry_id not in present]
+            if deleted:
+                target.delete(ids=deleted)
+                repaired += len(deleted)
+        return repaired
+
+    def migrate(self, organization_id: str) -> dict:
+        """Move an organization's entries to its own collection without re-embedding them.
+
+        Dual writes start first, then stored entries are copied by id with
+        their vectors and reconciled. Reads then move to the target while
+        writes (deletes included) still reach both, so any shared row the
+        target lacks was never copied; those are copied before the switch
+        to the target alone. The shared rows are removed once every process
+        has picked up that switch.
+        """
+        started = time.time()
+        report = {
+            "collection": self.base_name,
+            "organization_id": organization_id,
+            "target": self.collection_name(organization_id),
+            "copied": 0,
+            "repaired": 0,
+            "removed_from_shared": 0,
+        }
+        if self.state(organization_id, fresh=True) == SHARDED:
+            return {**report, "state": SHARDED, "duration_seconds": 0.0}
+
+        self._set_state(organization_id, MIGRATING)
+        self._has_shared_entries.discard(organization_id)
+        # Wait out the state cache so every process is dual writing before the copy
+        time.sleep(settings.COLLECTION_STATE_CACHE_SECONDS)
+
+        source = db_manager.get_collection(self.base_name)
+        target = db_manager.get_collection(self.collection_name(organization_id))
+        report["copied"] = self._copy(source, target, organization_id)
+        report["repaired"] = self._reconcile(source, target, organization_id)
+
+        self._set_state(organization_id, CUTOVER)
+        time.sleep(settings.COLLECTION_STATE_CACHE_SECONDS)
+        present = set(self._ids(target, organization_id))
+        missing = [entry_id for entry_id in self._ids(source, organization_id) if entry_id not in present]
+        for batch in self._batches(missing):
+            report["repaired"] += self._copy_ids(source, target, batch)
+
+        self._set_state(organization_id, SHARDED)
+        # Every process must stop writing to the shared collection first
+        time.sleep(settings.COLLECTION_STATE_CACHE_SECONDS)
+        leftover = self._ids(source, organization_id)
+        for batch in self._batches(leftover):
+            source.delete(ids=batch)
+        report["removed_from_shared"] = len(leftover)
+
+        report.update(state=SHARDED, duration_seconds=time.time() - started)
+        logger.info(
+            f"Migrated {organization_id} to {report['target']}: {report['copied']} copied, "
+            f"{report['repaired']} repaired, {len(leftover)} removed from {self.base_name}"
+        )
+        return report
@@ -1,32 +1,40 @@
 # app/services/document_ingestion.py
 
+import asyncio
 import os
 import uuid
-from typing import List
+from typing import List, Optional, Tuple
 import requests
 from langchain_unstructured import UnstructuredLoader
-from langchain_experimental.text_splitter import SemanticChunker
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from unstructured_client import UnstructuredClient
 from unstructured_client.utils import BackoffStrategy, RetryConfig
 from app.core.config import settings
 from app.schemas.document import DocumentCreate
+from app.services.document_manifest import DocumentManifest
+from app.services.semantic_chunker import EmbeddingSemanticChunker
+from app.utils.chunks import chunk_hash, format_chunk
+from app.utils.document_loader import load_document
+from app.core.logging_config import logging
 from langchain.schema import Document
 import os
 
+logger = logging.getLogger(__name__)
+
 class DocumentIngestionService:
-    def __init__(self):
+    def __init__(self, embeddings=None, llm=None, unstructured_client=None, manifest=None):
         os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
-        self.semantic_chunker = SemanticChunker(
+        self.embeddings = embeddings or GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
+        self.semantic_chunker = EmbeddingSemanticChunker(
             self.embeddings,
             breakpoint_threshold_type="interquartile",
             min_chunk_size=250
         )
-        self.llm = ChatGoogleGenerativeAI(
+        self.llm = llm or ChatGoogleGenerativeAI(
             model="gemini-1.5-flash",
         )
-        self.unstructured_client = self._create_unstructured_client()
+        self.unstructured_client = unstructured_client or self._create_unstructured_client()
+        self.manifest = manifest or DocumentManifest()
 
     def _create_unstructured_client(self):
         return UnstructuredClient(
@@ -45,32 +53,150 @@ class DocumentIngestionService:
             ),
         )
 
-    async def process_document(self, file_path: str, organization_id: str) -> List[Document]:
+    async def process_document(
+        self,
+        file_path: str,
+        organization_id: str,
+        file_name: str = None,
+        content_hash: str = None,
+        source_document_id: str = None,
+        topics: str = None,
+    ) -> List[Document]:
+        docs = self.partition(file_path)
+        semantic_chunks = self.chunk(docs)
+        return await self.enrich(
+            semantic_chunks,
+            file_path,
+            organization_id,
+            file_name=file_name,
+            content_hash=content_hash,
+            source_document_id=source_document_id,
+            topics=topics,
+        )
+
+    def partition(self, file_path: str) -> List[Document]:
+        """Split a file into elements, in-process for simple formats and via
+        the Unstructured API otherwise (see ``PARTITION_STRATEGY_BY_EXTENSION``)."""
+        extension = os.path.splitext(file_path)[1].lower()
+        strategy = settings.PARTITION_STRATEGY_BY_EXTENSION.get(extension, "api")
+
+        if strategy in ("local", "auto"):
+            try:
+                docs = load_document(file_path)
+            except Exception as e:
+                logger.warning(f"Local partitioning of {extension} file failed, using Unstructured API: {str(e)}")
+            else:
+                if strategy == "local" or self._has_text_layer(docs):
+                    elements = self._group_elements(docs, settings.PARTITION_MAX_CHARACTERS)
+                    logger.info(
+                        f"Partitioned {extension} file locally into {len(docs)} elements, "
+                        f"grouped into {len(elements)}"
+                    )
+                    return elements
+                logger.info(f"{extension} file has no usable text layer, using Unstructured API")
+
+        return self._partition_via_api(file_path)
+
+    @staticmethod
+    def _has_text_layer(docs: List[Document]) -> bool:
+        # Scanned PDFs come back from PyPDFLoader with little or no text per page
+        if not docs:
+            return False
+        total_chars = sum(len(doc.page_content.strip()) for doc in docs)
+        return total_chars / len(docs) >= settings.PDF_MIN_CHARS_PER_PAGE
+
+    @staticmethod
+    def _group_elements(docs: List[Document], max_characters: int) -> List[Document]:
+        """Join consecutive small elements (CSV rows, short pages) into groups
+        of up to ``max_characters``, like the API's ``by_title`` chunking, so
+        each one is not chunked and enriched on its own. Larger elements are
+        kept as they are."""
+        groups, parts, size = [], [], 0
+        metadata = {}
+        for doc in docs:
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            if parts and size + len(text) + 2 > max_characters:
+                groups.append(Document(page_content="\n\n".join(parts), metadata=metadata))
+                parts, size = [], 0
+            if not parts:
+                metadata = dict(doc.metadata)
+            parts.append(text)
+            size += len(text) + 2
+        if parts:
+            groups.append(Document(page_content="\n\n".join(parts), metadata=metadata))
+        return groups
+
+    def _partition_via_api(self, file_path: str) -> List[Document]:
         loader = UnstructuredLoader(
             file_path,
             partition_via_api=True,
             client=self.unstructured_client,
             chunking_strategy="by_title",
-            max_characters=5000,
+            max_characters=settings.PARTITION_MAX_CHARACTERS,
         )
-        docs = loader.load()
-        semantic_chunks = self.semantic_chunker.create_documents([d.page_content for d in docs])
-        
-        overall_doc_content = ' '.join([doc.page_content for doc in semantic_chunks])
-        keywords = await self.extract_keywords(overall_doc_content)
-        
+        return loader.load()
+
+    def chunk(self, docs: List[Document]) -> List[Document]:
+        return self.semantic_chunker.create_documents([d.page_content for d in docs])
+
+    def chunk_with_embeddings(self, docs: List[Document]) -> Tuple[List[Document], List[Optional[List[float]]]]:
+        """Chunk ``docs`` and return a vector per chunk derived from the chunker's
+        sentence embeddings (``None`` where none could be derived)."""
+        return self.semantic_chunker.create_documents_with_embeddings([d.page_content for d in docs])
+
+    async def enrich(
+        self,
+        semantic_chunks: List[Document],
+        file_path: str,
+        organization_id: str,
+        file_name: str = None,
+        content_hash: str = None,
+        source_document_id: str = None,
+        topics: str = None,
+    ) -> List[Document]:
+        """Prefix each chunk with the document's topics. ``topics`` (the
+        stored version's, on a replace) skips extracting them again."""
+        if topics is not None:
+            keywords = topics
+        else:
+            overall_doc_content = ' '.join([doc.page_content for doc in semantic_chunks])
+            keywords = await self.extract_keywords(overall_doc_content)
+        return self.build_documents(
+            semantic_chunks,
+            keywords,
+            file_path,
+            organization_id,
+            file_name=file_name,
+            content_hash=content_hash,
+            source_document_id=source_document_id,
+        )
+
+    def build_documents(
+        self,
+        semantic_chunks: List[Document],
+        keywords: str,
+        file_path: str,
+        organization_id: str,
+        file_name: str = None,
+        content_hash: str = None,
+        source_document_id: str = None,
+    ) -> List[Document]:
         processed_docs = []
-        source_document_id = str(uuid.uuid4())
+        source_document_id = source_document_id or str(uuid.uuid4())
         
         for idx, chunk in enumerate(semantic_chunks):
             doc = Document(
-                page_content=f"Relevant Topics Covered: {keywords}\nContent: {chunk.page_content}",
+                page_content=format_chunk(keywords, chunk.page_content),
                 metadata={
                     "organization_id": organization_id,
-                    "source_file_name": os.path.basename(file_path),
+                    "source_file_name": file_name or os.path.basename(file_path),
                     "source_file_path": file_path, # TODO - We need s3 link here
                     "source_document_id": source_document_id,
                     "part_number": idx+1,
+                    "chunk_hash": chunk_hash(chunk.page_content),
+                    **({"content_hash": content_hash} if content_hash else {}),
                 },
             )
             processed_docs.append(doc)
@@ -78,12 +204,56 @@ class DocumentIngestionService:
         return processed_docs
 
     async def extract_keywords(self, content: str) -> str:
+        """Topics covered by ``content``, as a comma-separated string.
+
+        Long documents are split into sections of ``KEYWORD_SECTION_CHARS``
+        whose topics are extracted concurrently and then merged in order.
+        """
+        sections = self._split_sections(content, settings.KEYWORD_SECTION_CHARS)
+        if len(sections) <= 1:
+            return await self._extract_section_keywords(content)
+
+        semaphore = asyncio.Semaphore(max(1, settings.KEYWORD_MAX_CONCURRENCY))
+
+        async def _extract(section: str) -> str:
+            async with semaphore:
+                return await self._extract_section_keywords(section)
+
+        section_topics = await asyncio.gather(*(_extract(section) for section in sections))
+        return await self._merge_keywords(section_topics)
+
+    @staticmethod
+    def _split_sections(content: str, max_chars: int) -> List[str]:
+        sections = []
+        while len(content) > max_chars:
+            cut = content.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sections.append(content[:cut])
+            content = content[cut:].lstrip()
+        if content:
+            sections.append(content)
+        return sections
+
+    async def _extract_section_keywords(self, content: str) -> str:
         prompt = f"""I am building a RAG based application and this is a document provided by the user. Can you please give me topics being covered in the document? Please write everything in order and do not miss topics. Mention the most important headings being covered in the document which will help in retrieval later.
         Respond as a comma-separated string.
         {content}
         """
-        response = self.llm.invoke(prompt)
-        
+        response = await self.llm.ainvoke(prompt)
+        return self._response_text(response)
+
+    async def _merge_keywords(self, section_topics: List[str]) -> str:
+        numbered = "\n".join(f"Section {idx + 1}: {topics}" for idx, topics in enumerate(section_topics))
+        prompt = f"""These are the topics covered by consecutive sections of one document. Merge them into a single list of topics for the whole document. Keep the document order, remove duplicates and do not drop any distinct topic.
+        Respond as a comma-separated string.
+        {numbered}
+        """
+        response = await self.llm.ainvoke(prompt)
+        return self._response_text(response)
+
+    @staticmethod
+    def _response_text(response) -> str:
         # Extract the content from the response
         if isinstance(response.content, str):
             return response.content
@@ -92,4 +262,4 @@ class DocumentIngestionService:
             return ", ".join([str(item) for item in response.content if isinstance(item, str)])
         else:
             # If it's neither a string nor a list, convert to string
-            return str(response.content)
\ No newline at end of file
+            return str(response.content)
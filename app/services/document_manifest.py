@@ -0,0 +1,104 @@
+# app/services/document_manifest.py
+
+import json
+from typing import Optional
+from app.core.logging_config import logging
+from app.core.redis_client import get_redis
+from app.services.collection_router import CollectionRouter
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentManifest:
+    """Per-organization record of ingested documents keyed by content hash.
+
+    Lives in Redis so the API can answer duplicate uploads before queuing any
+    work. Chunk metadata in Chroma also carries ``content_hash`` and is used
+    as a fallback when the manifest has no entry (e.g. after a Redis flush).
+    """
+
+    def __init__(self, collection_name: str = "documents", prefix: str = "docmanifest", collections: CollectionRouter = None):
+        self.collection_name = collection_name
+        self.collections = collections or CollectionRouter(collection_name)
+        self.prefix = prefix
+
+    def _hashes_key(self, organization_id: str) -> str:
+        return f"{self.prefix}:{organization_id}:hashes"
+
+    def _documents_key(self, organization_id: str) -> str:
+        return f"{self.prefix}:{organization_id}:documents"
+
+    def _pending_key(self, organization_id: str) -> str:
+        # source_document_id -> hash of content claimed but not yet ingested.
+        # Kept apart from the documents mapping so a replace in progress does
+        # not lose track of the hash its current content is stored under.
+        return f"{self.prefix}:{organization_id}:pending"
+
+    def get(self, organization_id: str, content_hash: str) -> Optional[dict]:
+        data = get_redis().hget(self._hashes_key(organization_id), content_hash)
+        return json.loads(data) if data else None
+
+    def _find_in_store(self, organization_id: str, content_hash: str) -> Optional[dict]:
+        collection = self.collections.read_collection(organization_id)
+        existing = collection.get(
+            where={"$and": [{"organization_id": organization_id}, {"content_hash": content_hash}]},
+            include=["metadatas"],
+            limit=1,
+        )
+        if not existing["ids"]:
+            return None
+        return {
+            "source_document_id": existing["metadatas"][0]["source_document_id"],
+            "task_id": None,
+            "status": "completed",
+        }
+
+    def claim(self, organization_id: str, content_hash: str, source_document_id: str, task_id: str) -> Optional[dict]:
+        """Register a new upload; return the existing entry if the content is already known."""
+        try:
+            existing = self.get(organization_id, content_hash) or self._find_in_store(organization_id, content_hash)
+            if existing is not None:
+                return existing
+
+            entry = {"source_document_id": source_document_id, "task_id": task_id, "status": "processing"}
+            client = get_redis()
+            if not client.hsetnx(self._hashes_key(organization_id), content_hash, json.dumps(entry)):
+                # Lost a race with a concurrent upload of the same content
+                return self.get(organization_id, content_hash)
+            client.hset(self._pending_key(organization_id), source_document_id, content_hash)
+            return None
+        except Exception as e:
+            logger.warning(f"Document manifest unavailable, skipping deduplication: {str(e)}")
+            return None
+
+    def mark_completed(self, organization_id: str, content_hash: str, source_document_id: str):
+        entry = {"source_document_id": source_document_id, "task_id": None, "status": "completed"}
+        client = get_redis()
+        # A replaced document no longer owns the hash of its previous content
+        previous_hash = client.hget(self._documents_key(organization_id), source_document_id)
+        if previous_hash and previous_hash.decode() != content_hash:
+            client.hdel(self._hashes_key(organization_id), previous_hash.decode())
+        pipe = client.pipeline()
+        pipe.hset(self._hashes_key(organization_id), content_hash, json.dumps(entry))
+        pipe.hset(self._documents_key(organization_id), source_document_id, content_hash)
+        pipe.hdel(self._pending_key(organization_id), source_document_id)
+        pipe.execute()
+
+    def release(self, organization_id: str, content_hash: str, source_document_id: str):
+        """Forget a claim whose ingestion failed so the file can be uploaded again."""
+        existing = self.get(organization_id, content_hash)
+        if existing and existing["source_document_id"] == source_document_id and existing["status"] != "completed":
+            get_redis().hdel(self._hashes_key(organization_id), content_hash)
+        get_redis().hdel(self._pending_key(organization_id), source_document_id)
+
+    def remove_document(self, organization_id: str, source_document_id: str):
+        try:
+            client = get_redis()
+            # Both the stored content and content still being ingested
+            for key in (self._documents_key(organization_id), self._pending_key(organization_id)):
+                content_hash = client.hget(key, source_document_id)
+                if content_hash:
+                    client.hdel(self._hashes_key(organization_id), content_hash.decode())
+                client.hdel(key, source_document_id)
+        except Exception as e:
+            logger.warning(f"Failed to remove {source_document_id} from document manifest: {str(e)}")
@@ -0,0 +1,223 @@
+# app/services/embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class RedisEmbeddingStore:
+    """Persistent embedding tier shared by every API and worker process."""
+
+    def __init__(self, prefix: str = "embcache", max_entries: int = None, ttl: int = None):
+        self.prefix = prefix
+        self.index_key = f"{prefix}:index"
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.EMBEDDING_CACHE_TTL_SECONDS
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return get_redis().mget([f"{self.prefix}:{key}" for key in keys])
+
+    def set_many(self, items: Dict[str, bytes]):
+        client = get_redis()
+        now = time.time()
+        pipe = client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(f"{self.prefix}:{key}", value, ex=self.ttl)
+            pipe.zadd(self.index_key, {key: now})
+        pipe.zcard(self.index_key)
+        size = pipe.execute()[-1]
+
+        # Evict the oldest entries once the tier grows past its bound
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = client.zpopmin(self.index_key, overflow)
+            if evicted:
+                client.delete(*[f"{self.prefix}:{key.decode()}" for key, _ in evicted])
+
+
+class DiskEmbeddingStore:
+    """Persistent embedding tier in a local SQLite file, for single-host setups."""
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path or settings.EMBEDDING_CACHE_DISK_PATH
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            placeholders = ",".join("?" for _ in keys)
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            found = dict(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?",
+                    [(time.time(), key) for key in found],
+                )
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, bytes]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY accessed ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of an embeddings client.
+
+    Vectors are keyed by (model, task_type, sha256(text)), looked up first in a
+    bounded in-memory LRU and then in an optional persistent store. Only texts
+    missing from both tiers are sent to the wrapped client.
+    """
+
+    def __init__(self, underlying: Embeddings, store=None, max_memory_entries: int = None):
+        self.underlying = underlying
+        self.store = store
+        self.max_memory_entries = max_memory_entries or settings.EMBEDDING_CACHE_MEMORY_ENTRIES
+        self.model = getattr(underlying, "model", type(underlying).__name__)
+        self.task_type = getattr(underlying, "task_type", None)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _key(self, text: str, task_type: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{self.model}\x00{task_type}\x00{digest}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> List[Optional[List[float]]]:
+        results = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.append(i)
+
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache store lookup failed: {str(e)}")
+                stored = [None] * len(missing)
+            for i, data in zip(missing, stored):
+                if data is not None:
+                    results[i] = _unpack(data)
+                    self._remember(keys[i], results[i])
+                    self.persistent_hits += 1
+        return results
+
+    def _save(self, items: Dict[str, List[float]]):
+        for key, vector in items.items():
+            self._remember(key, vector)
+        if self.store is not None and items:
+            try:
+                self.store.set_many({key: _pack(vector) for key, vector in items.items()})
+            except Exception as e:
+                logger.warning(f"Embedding cache store write failed: {str(e)}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        task_type = self.task_type or "retrieval_document"
+        keys = [self._key(text, task_type) for text in texts]
+        results = self._lookup(keys)
+
+        # Embed each distinct missing text once, even if repeated in the batch
+        pending = OrderedDict()
+        for i, vector in enumerate(results):
+            if vector is None:
+                pending.setdefault(keys[i], texts[i])
+        if pending:
+            with self._lock:
+                self.misses += len(pending)
+            vectors = self.underlying.embed_documents(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            self._save(computed)
+            results = [vector if vector is not None else computed[keys[i]] for i, vector in enumerate(results)]
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        task_type = self.task_type or "retrieval_query"
+        key = self._key(text, task_type)
+        vector = self._lookup([key])[0]
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            vector = self.underlying.embed_query(text)
+            self._save({key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.persistent_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+def create_embedding_store():
+    backend = settings.EMBEDDING_CACHE_BACKEND
+    if backend == "redis":
+        return RedisEmbeddingStore()
+    if backend == "disk":
+        return DiskEmbeddingStore()
+    return None
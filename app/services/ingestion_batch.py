@@ -0,0 +1,117 @@
+# app/services/ingestion_batch.py
+
+import json
+import time
+from typing import List, Optional
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+class IngestionBatchTracker:
+    """Redis record of a bulk upload: queued files and aggregated progress.
+
+    ``docbatch:{id}`` holds the counters, ``docbatch:{id}:pending`` the files
+    not dispatched yet and ``docbatch:{id}:files`` the per-file status keyed
+    by task id. Files are dispatched from the pending list as earlier ones
+    finish, which bounds how many of a batch run at once.
+    """
+
+    def __init__(self, prefix: str = "docbatch"):
+        self.prefix = prefix
+
+    def _key(self, batch_id: str, name: str = None) -> str:
+        return f"{self.prefix}:{batch_id}:{name}" if name else f"{self.prefix}:{batch_id}"
+
+    def create(self, batch_id: str, organization_id: str, items: List[dict], duplicates: List[dict]):
+        """Record a batch. ``items`` are files to ingest, ``duplicates`` files
+        whose content was already known and will not be processed again."""
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.hset(self._key(batch_id), mapping={
+            "organization_id": organization_id,
+            "created_at": time.time(),
+            "total": len(items) + len(duplicates),
+            "duplicates": len(duplicates),
+            "completed": 0,
+            "failed": 0,
+            "chunks_embedded": 0,
+        })
+        files = {}
+        for item in items:
+            files[item["task_id"]] = json.dumps({
+                "file_name": item["file_name"],
+                "source_document_id": item["source_document_id"],
+                "status": "queued",
+            })
+        for index, item in enumerate(duplicates):
+            files[f"duplicate-{index}"] = json.dumps({
+                "file_name": item["file_name"],
+                "source_document_id": item["source_document_id"],
+                "status": "duplicate",
+            })
+        if files:
+            pipe.hset(self._key(batch_id, "files"), mapping=files)
+        if items:
+            pipe.rpush(self._key(batch_id, "pending"), *[json.dumps(item) for item in items])
+        for name in (None, "files", "pending"):
+            pipe.expire(self._key(batch_id, name), settings.BULK_BATCH_TTL_SECONDS)
+        pipe.execute()
+
+    def pop_pending(self, batch_id: str) -> Optional[dict]:
+        data = get_redis().lpop(self._key(batch_id, "pending"))
+        return json.loads(data) if data else None
+
+    def _set_file_status(self, batch_id: str, task_id: str, **fields):
+        client = get_redis()
+        data = client.hget(self._key(batch_id, "files"), task_id)
+        entry = json.loads(data) if data else {}
+        entry.update(fields)
+        client.hset(self._key(batch_id, "files"), task_id, json.dumps(entry))
+
+    def mark_started(self, batch_id: str, task_id: str):
+        self._set_file_status(batch_id, task_id, status="processing")
+
+    def mark_finished(self, batch_id: str, task_id: str, succeeded: bool, chunks: int = 0, error: str = None) -> bool:
+        """Count a finished file once; returns False if it was already counted."""
+        client = get_redis()
+        finished_key = self._key(batch_id, "finished")
+        if not client.sadd(finished_key, task_id):
+            return False
+        client.expire(finished_key, settings.BULK_BATCH_TTL_SECONDS)
+        pipe = client.pipeline()
+        if succeeded:
+            pipe.hincrby(self._key(batch_id), "completed", 1)
+            pipe.hincrby(self._key(batch_id), "chunks_embedded", chunks)
+        else:
+            pipe.hincrby(self._key(batch_id), "failed", 1)
+        pipe.execute()
+        self._set_file_status(
+            batch_id,
+            task_id,
+            status="completed" if succeeded else "failed",
+            **({"chunks": chunks} if succeeded else {"error": error}),
+        )
+        return True
+
+    def get(self, batch_id: str) -> Optional[dict]:
+        client = get_redis()
+        record = client.hgetall(self._key(batch_id))
+        if not record:
+            return None
+        record = {key.decode(): value.decode() for key, value in record.items()}
+        files = client.hgetall(self._key(batch_id, "files"))
+        counters = {name: int(record[name]) for name in ("total", "duplicates", "completed", "failed", "chunks_embedded")}
+        queued = client.llen(self._key(batch_id, "pending"))
+        finished = counters["duplicates"] + counters["completed"] + counters["failed"]
+        return {
+            "batch_id": batch_id,
+            "organization_id": record["organization_id"],
+            "status": "completed" if finished >= counters["total"] else "processing",
+            **counters,
+            "queued": queued,
+            "in_progress": counters["total"] - finished - queued,
+            "files": [
+                {"task_id": task_id.decode(), **json.loads(entry)}
+                for task_id, entry in files.items()
+            ],
+        }
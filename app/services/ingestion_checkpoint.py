@@ -0,0 +1,53 @@
+# app/services/ingestion_checkpoint.py
+
+import json
+import os
+import shutil
+from typing import List, Optional
+from langchain.schema import Document
+from app.core.config import settings
+
+
+def documents_to_json(documents: List[Document]) -> List[dict]:
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+
+def documents_from_json(data: List[dict]) -> List[Document]:
+    return [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in data]
+
+
+class IngestionCheckpointStore:
+    """Intermediate output of each ingestion pipeline stage, one JSON file per stage.
+
+    The directory must be shared by every worker that runs pipeline stages.
+    A stage that finds its own checkpoint already written skips the work, so
+    a retried pipeline resumes from the stage that failed.
+    """
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or settings.INGESTION_CHECKPOINT_DIR
+
+    def _path(self, pipeline_id: str, stage: str) -> str:
+        return os.path.join(self.base_dir, pipeline_id, f"{stage}.json")
+
+    def exists(self, pipeline_id: str, stage: str) -> bool:
+        return os.path.exists(self._path(pipeline_id, stage))
+
+    def save(self, pipeline_id: str, stage: str, payload):
+        path = self._path(pipeline_id, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a crashed stage never leaves a half-written checkpoint
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def load(self, pipeline_id: str, stage: str) -> Optional[object]:
+        path = self._path(pipeline_id, stage)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def clear(self, pipeline_id: str):
+        shutil.rmtree(os.path.join(self.base_dir, pipeline_id), ignore_errors=True)
@@ -0,0 +1,211 @@
+# app/services/lexical_index.py
+
+import json
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.core.redis_client import get_redis
+from app.services.collection_router import CollectionRouter
+from app.utils.bm25 import idf, term_score, tokenize
+from app.utils.chunks import chunk_content
+
+logger = logging.getLogger(__name__)
+
+
+class LexicalIndex:
+    """BM25 inverted index over one organization's chunks.
+
+    Only the chunk itself is indexed, not the document topics prefix every
+    chunk of a document shares, so topic terms do not match all of them.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, ids: List[str], texts: List[str]):
+        self.remove(ids)
+        for doc_id, text in zip(ids, texts):
+            terms = Counter(tokenize(chunk_content(text or "")))
+            self.doc_terms[doc_id] = terms
+            self.doc_len[doc_id] = sum(terms.values())
+            self.total_len += self.doc_len[doc_id]
+            for term, tf in terms.items():
+                self.postings[term][doc_id] = tf
+
+    def remove(self, ids: List[str]):
+        for doc_id in ids:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                continue
+            self.total_len -= self.doc_len.pop(doc_id, 0)
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        num_docs = len(self.doc_terms)
+        if not num_docs:
+            return []
+        avg_doc_len = self.total_len / num_docs
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            term_idf = idf(num_docs, len(postings))
+            for doc_id, tf in postings.items():
+                scores[doc_id] += term_score(tf, self.doc_len[doc_id], avg_doc_len, term_idf)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class LexicalIndexManager:
+    """Per-organization lexical indexes for one Chroma collection.
+
+    Each process keeps its own in-memory indexes. Writes append the changed
+    ids to a per-org Redis stream; before searching, a process replays the
+    entries it has not seen yet (fetching added texts from Chroma by id), so
+    chunks ingested by Celery workers become searchable in the API processes
+    without rebuilding the whole index. A full rebuild only happens for a
+    new index or when the stream was trimmed past the local position. Each
+    organization has its own lock, so a rebuild only blocks that organization.
+    """
+
+    def __init__(self, collection_name: str, collections: CollectionRouter = None):
+        self.collection_name = collection_name
+        self.collections = collections or CollectionRouter(collection_name)
+        # organization_id -> (last applied stream id, index)
+        self._indexes: Dict[str, Tuple[bytes, LexicalIndex]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _changes_key(self, organization_id: str) -> str:
+        return f"lexindex:{self.collection_name}:{organization_id}:changes"
+
+    def _org_lock(self, organization_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(organization_id, threading.Lock())
+
+    def _build(self, organization_id: str) -> LexicalIndex:
+        index = LexicalIndex()
+        collection = self.collections.read_collection(organization_id)
+        offset = 0
+        page_size = settings.LEXICAL_INDEX_PAGE_SIZE
+        while True:
+            page = collection.get(
+                where={"organization_id": organization_id},
+                include=["documents"],
+                limit=page_size,
+                offset=offset,
+            )
+            index.add(page["ids"], page["documents"])
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+        logger.info(f"Built lexical index for {organization_id} with {len(index)} chunks")
+        return index
+
+    def _replay(self, organization_id: str, index: LexicalIndex, entries):
+        collection = self.collections.read_collection(organization_id)
+        for _, fields in entries:
+            ids = json.loads(fields[b"ids"])
+            if fields[b"op"] == b"remove":
+                index.remove(ids)
+                continue
+            # Texts are read back by id; ids deleted since are simply missing
+            found = collection.get(ids=ids, include=["documents"])
+            index.remove(ids)
+            index.add(found["ids"], found["documents"])
+
+    def get(self, organization_id: str) -> LexicalIndex:
+        with self._org_lock(organization_id):
+            cached = self._indexes.get(organization_id)
+            try:
+                client = get_redis()
+                key = self._changes_key(organization_id)
+                if cached is not None:
+                    last_id, index = cached
+                    first = client.xrange(key, count=1)
+                    # Entries after last_id were trimmed away: deltas are incomplete
+                    if last_id == b"0-0" or (first and _stream_id(first[0][0]) <= _stream_id(last_id)):
+                        entries = client.xrange(key, min=b"(" + last_id) if last_id != b"0-0" else client.xrange(key)
+                        if entries:
+                            self._replay(organization_id, index, entries)
+                            self._indexes[organization_id] = (entries[-1][0], index)
+                        return index
+                tail = client.xrevrange(key, count=1)
+                # Position taken before reading Chroma so writes made during
+                # the build are replayed afterwards (replays are idempotent)
+                last_id = tail[0][0] if tail else b"0-0"
+            except Exception as e:
+                logger.warning(f"Lexical index change log unavailable: {str(e)}")
+                if cached is not None:
+                    return cached[1]
+                last_id = None
+            index = self._build(organization_id)
+            if last_id is not None:
+                self._indexes[organization_id] = (last_id, index)
+            return index
+
+    def _record(self, organization_id: str, op: str, ids: List[str], change):
+        if not ids:
+            return
+        with self._org_lock(organization_id):
+            cached = self._indexes.get(organization_id)
+            try:
+                client = get_redis()
+                key = self._changes_key(organization_id)
+                entry_id = client.xadd(
+                    key,
+                    {"op": op, "ids": json.dumps(ids)},
+                    maxlen=settings.LEXICAL_INDEX_CHANGE_LOG_SIZE,
+                    approximate=True,
+                )
+                if cached is None:
+                    return
+                previous = client.xrevrange(key, max=b"(" + entry_id, count=1)
+                previous_id = previous[0][0] if previous else b"0-0"
+            except Exception as e:
+                logger.warning(f"Lexical index change log write failed: {str(e)}")
+                self._indexes.pop(organization_id, None)
+                return
+            # Patch the local index in place if it was current before this
+            # write; otherwise the next search replays the missing entries
+            if cached[0] == previous_id:
+                change(cached[1])
+                self._indexes[organization_id] = (entry_id, cached[1])
+
+    def add(self, organization_id: str, ids: List[str], texts: List[str]):
+        self._record(organization_id, "add", ids, lambda index: index.add(ids, texts))
+
+    def remove(self, organization_id: str, ids: List[str]):
+        self._record(organization_id, "remove", ids, lambda index: index.remove(ids))
+
+    def search(self, organization_id: str, query: str, k: int) -> List[Tuple[str, float]]:
+        index = self.get(organization_id)
+        with self._org_lock(organization_id):
+            return index.search(query, k)
+
+
+def _stream_id(entry_id: bytes) -> Tuple[int, int]:
+    millis, _, sequence = entry_id.decode().partition("-")
+    return int(millis), int(sequence or 0)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists; ids ranked well by several retrievers rise to the top."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -2,77 +2,78 @@
 
 from app.core.db import db_manager
 from app.core.exceptions import AppException
+from app.core.executor import run_blocking
+from app.services.organization_registry import OrganizationRegistry
 from chromadb.api.types import Document, EmbeddingFunction, Embeddings
 import re
 
 class OrganizationService:
-    def __init__(self):
+    def __init__(self, org_registry: OrganizationRegistry = None):
         self.collection_name = "organizations"
+        self.org_registry = org_registry
 
     async def create_organization(self, name: str, description: str):
         if not re.match(r'^[a-z0-9]+(_[a-z0-9]+)*$', name):
             raise ValueError(f"Organization name '{name}' must be in snake case")
 
-        with db_manager.get_client() as client:
-            if client is None:
-                raise AppException(500, "Failed to connect to the database")
-            
-            collection = client.get_or_create_collection(self.collection_name)
-            existing_org = collection.get(where={"name": name})
-            
-            if existing_org["ids"]:
-                raise ValueError(f"Organization '{name}' already exists")
-            
-            org_data = f"{description}"
-            collection.add(
-                documents=[org_data],
-                metadatas=[{"organization_id": name}],
-                ids=[name]
-            )
-            return {"name": name, "description": description}
+        collection = await run_blocking(db_manager.get_collection, self.collection_name)
+        existing_org = await run_blocking(collection.get, ids=[name], include=[])
+        
+        if existing_org["ids"]:
+            raise ValueError(f"Organization '{name}' already exists")
+        
+        org_data = f"{description}"
+        await run_blocking(
+            collection.add,
+            documents=[org_data],
+            metadatas=[{"organization_id": name}],
+            ids=[name]
+        )
+        self._record("created", name, description)
+        return {"name": name, "description": description}
 
     async def update_organization(self, name: str, description: str):
-        with db_manager.get_client() as client:
-            if client is None:
-                raise AppException(500, "Failed to connect to the database")
-            
-            collection = client.get_or_create_collection(self.collection_name)
-            existing_org = collection.get(where={"organization_id": name})
-            
-            if not existing_org["ids"]:
-                raise ValueError(f"Organization '{name}' not found")
-            
-            updated_data = f"{description}"
-            collection.update(
-                documents=[updated_data],
-                metadatas=[{"organization_id": name}],
-                ids=[name]
-            )
-            return {"name": name, "description": description}
+        collection = await run_blocking(db_manager.get_collection, self.collection_name)
+        existing_org = await run_blocking(collection.get, ids=[name], include=[])
+        
+        if not existing_org["ids"]:
+            raise ValueError(f"Organization '{name}' not found")
+        
+        updated_data = f"{description}"
+        await run_blocking(
+            collection.update,
+            documents=[updated_data],
+            metadatas=[{"organization_id": name}],
+            ids=[name]
+        )
+        self._record("updated", name, description)
+        return {"name": name, "description": description}
     
     async def get_organization(self, name: str):
-        with db_manager.get_client() as client:
-            if client is None:
-                raise AppException(500, "Failed to connect to the database")
-            
-            collection = client.get_or_create_collection(self.collection_name)
-            existing_org = collection.get(where={"organization_id": name})
-            
-            if not existing_org["ids"]:
-                raise ValueError(f"Organization '{name}' not found")
-            
-            return existing_org
+        collection = await run_blocking(db_manager.get_collection, self.collection_name)
+        existing_org = await run_blocking(collection.get, ids=[name])
+        
+        if not existing_org["ids"]:
+            raise ValueError(f"Organization '{name}' not found")
         
+        return existing_org
+        
+    async def list_organization_ids(self):
+        collection = await run_blocking(db_manager.get_collection, self.collection_name)
+        existing_orgs = await run_blocking(collection.get, include=[])
+        return existing_orgs["ids"]
+
     async def delete_organization(self, name: str):
-        with db_manager.get_client() as client:
-            if client is None:
-                raise AppException(500, "Failed to connect to the database")
-            
-            collection = client.get_or_create_collection(self.collection_name)
-            existing_org = collection.get(where={"organization_id": name})
-            
-            if not existing_org["ids"]:
-                raise ValueError(f"Organization '{name}' not found")
-            
-            collection.delete(ids=[name])
-            return {"message": f"Organization '{name}' deleted successfully"}
\ No newline at end of file
+        collection = await run_blocking(db_manager.get_collection, self.collection_name)
+        existing_org = await run_blocking(collection.get, ids=[name], include=[])
+        
+        if not existing_org["ids"]:
+            raise ValueError(f"Organization '{name}' not found")
+        
+        await run_blocking(collection.delete, ids=[name])
+        self._record("deleted", name)
+        return {"message": f"Organization '{name}' deleted successfully"}
+
+    def _record(self, action: str, name: str, description: str = None):
+        if self.org_registry is not None:
+            self.org_registry.record(action, name, description)
@@ -0,0 +1,135 @@
+# app/services/organization_registry.py
+
+import json
+import threading
+import time
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.db import db_manager
+from app.core.exceptions import AppException
+from app.core.executor import run_blocking
+from app.core.logging_config import logging
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class OrganizationRegistry:
+    """Process-local copy of the ``organizations`` collection.
+
+    Loaded at startup and reloaded every ``ORG_REGISTRY_TTL_SECONDS``.
+    Writes made through ``OrganizationService`` are applied locally and
+    broadcast on the ``organizations:changed`` Redis channel so other
+    processes apply them too. Ids missing from the copy are checked against
+    Chroma by key, with negative results cached for
+    ``ORG_NEGATIVE_CACHE_SECONDS``.
+    """
+
+    channel = "organizations:changed"
+
+    def __init__(self, collection_name: str = "organizations"):
+        self.collection_name = collection_name
+        self._organizations: Dict[str, str] = {}
+        self._missing: Dict[str, float] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._listener = None
+
+    def load(self):
+        collection = db_manager.get_collection(self.collection_name)
+        existing = collection.get(include=["documents"])
+        with self._lock:
+            self._organizations = dict(zip(existing["ids"], existing["documents"]))
+            self._missing.clear()
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(existing['ids'])} organizations")
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > settings.ORG_REGISTRY_TTL_SECONDS
+
+    def get(self, organization_id: str) -> Optional[str]:
+        """Description of a known organization, or None."""
+        return self._organizations.get(organization_id)
+
+    def _lookup(self, organization_id: str) -> bool:
+        missing_since = self._missing.get(organization_id)
+        if missing_since is not None and time.monotonic() - missing_since < settings.ORG_NEGATIVE_CACHE_SECONDS:
+            return False
+        collection = db_manager.get_collection(self.collection_name)
+        existing = collection.get(ids=[organization_id], include=["documents"])
+        with self._lock:
+            if existing["ids"]:
+                self._organizations[organization_id] = existing["documents"][0]
+                self._missing.pop(organization_id, None)
+                return True
+            self._missing[organization_id] = time.monotonic()
+            return False
+
+    async def ensure(self, organization_id: str):
+        """Raise a 404 AppException unless ``organization_id`` exists.
+
+        Known organizations are answered from memory; only unknown ids go to
+        Chroma. When the copy is stale one caller reloads it while the others
+        keep using the current copy.
+        """
+        if not settings.ORG_VALIDATION_ENABLED:
+            return
+        if self._is_stale() and self._reload_lock.acquire(blocking=False):
+            try:
+                if self._is_stale():
+                    await run_blocking(self.load)
+            except Exception as e:
+                # Keep serving the current copy rather than retrying per request
+                self._loaded_at = time.monotonic()
+                logger.warning(f"Failed to reload organizations: {str(e)}")
+            finally:
+                self._reload_lock.release()
+        if organization_id in self._organizations:
+            return
+        if not await run_blocking(self._lookup, organization_id):
+            raise AppException(status_code=404, detail=f"Organization '{organization_id}' not found")
+
+    def _apply(self, action: str, organization_id: str, description: str = None):
+        with self._lock:
+            if action == "deleted":
+                self._organizations.pop(organization_id, None)
+            else:
+                self._organizations[organization_id] = description
+                self._missing.pop(organization_id, None)
+
+    def record(self, action: str, organization_id: str, description: str = None):
+        """Apply a write locally and broadcast it to the other processes."""
+        self._apply(action, organization_id, description)
+        try:
+            get_redis().publish(self.channel, json.dumps({
+                "action": action,
+                "organization_id": organization_id,
+                "description": description,
+            }))
+        except Exception as e:
+            logger.warning(f"Failed to broadcast organization change: {str(e)}")
+
+    def _on_message(self, message):
+        try:
+            change = json.loads(message["data"])
+            self._apply(change["action"], change["organization_id"], change.get("description"))
+        except Exception as e:
+            logger.warning(f"Ignoring malformed organization change: {str(e)}")
+
+    def start(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.warning(f"Failed to load organizations, will retry on demand: {str(e)}")
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            logger.warning(f"Organization change listener unavailable, relying on TTL refresh: {str(e)}")
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
@@ -1,141 +1,541 @@
 # app/services/question_answer.py
 
 from app.core.db import db_manager
-from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_cohere import CohereRerank
+from app.services.reranker import create_reranker
 from app.core.config import settings
 from langchain.schema import Document
-from app.schemas.question_answer import QuestionAnswerCreate, QuestionAnswerSearch, QuestionAnswerResponse
+from app.schemas.question_answer import (
+    QuestionAnswerBulkResponse,
+    QuestionAnswerCreate,
+    QuestionAnswerResponse,
+    QuestionAnswerSearch,
+    QuestionMergeStateResponse,
+)
 from app.schemas.chat import ChatRequest
-from typing import List, Tuple, Union
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
 import uuid
 import os
 from app.core.logging_config import logging
 from app.core.exceptions import AppException
+from app.core.executor import run_blocking
+from app.core.celery_app import celery_app
+from app.services.batch_embedding import embed_in_batches
+from app.services.collection_router import CollectionRouter
+from app.services.question_merge import QuestionMergeQueue
 
 logger = logging.getLogger(__name__)
 class QuestionAnswerService:
-    def __init__(self):
+    def __init__(self, embeddings=None, llm=None, reranker=None, answer_cache=None, merge_queue=None, collections: CollectionRouter = None):
         os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
         os.environ["COHERE_API_KEY"] = settings.COHERE_API_KEY
         self.collection_name = "questions_answers"
-        self.llm = ChatGoogleGenerativeAI(
+        self.llm = llm or ChatGoogleGenerativeAI(
             model="gemini-1.5-flash",
         )
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
-        self.reranker = CohereRerank(model="rerank-english-v2.0")
+        self.embeddings = embeddings or GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
+        self.reranker = reranker or create_reranker()
+        self.answer_cache = answer_cache
+        self.merge_queue = merge_queue or QuestionMergeQueue()
+        self.collections = collections or CollectionRouter(self.collection_name)
 
     async def add_question_answer(self, qa_data: QuestionAnswerCreate) -> QuestionAnswerResponse:
-        with db_manager.get_client() as client:
-            if not client:
-                raise Exception("Failed to connect to the database")
-
-            vector_store = Chroma(
-                client=client,
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
-            )
+        """Store a QA pair right away.
+
+        If it is a near-duplicate of an existing entry it is still stored
+        (tagged with ``merge_target``) and queued to be merged into that
+        entry by a background task, so the request never waits on the LLM.
+        """
+        content = self.format_content(qa_data.question, qa_data.answer)
+        embedding = (await run_blocking(self.embeddings.embed_documents, [content]))[0]
+        collection = await run_blocking(self.collections.read_collection, qa_data.organization_id)
+
+        # Check for similar questions
+        similar = await run_blocking(
+            collection.query,
+            query_embeddings=[embedding],
+            n_results=1,
+            where={"organization_id": qa_data.organization_id},
+            include=["distances", "metadatas"],
+        )
+        merge_target = None
+        if similar["ids"] and similar["ids"][0] and similar["distances"][0][0] < settings.QA_DUPLICATE_DISTANCE:
+            # Chain onto the final entry if the match is itself waiting to be merged
+            merge_target = (similar["metadatas"][0][0] or {}).get("merge_target") or similar["ids"][0][0]
+            logger.info(f"Question is a near-duplicate of {merge_target} (distance {similar['distances'][0][0]:.3f})")
 
-            # Check for similar questions
-            similar_questions = vector_store.similarity_search_with_score(
-                qa_data.question,
-                k=1,
-                filter={"organization_id": qa_data.organization_id}
+        qa_id = str(uuid.uuid4())
+        metadata = {"id": qa_id, "organization_id": qa_data.organization_id}
+        if merge_target:
+            metadata["merge_target"] = merge_target
+        for collection in await self._write_collections(qa_data.organization_id):
+            await run_blocking(collection.upsert, ids=[qa_id], embeddings=[embedding], documents=[content], metadatas=[metadata])
+        await self._invalidate_answers(qa_data.organization_id)
+
+        if merge_target and await run_blocking(self.merge_queue.add, merge_target, qa_id):
+            celery_app.send_task(
+                'app.tasks.question_answer.merge_pending_questions',
+                args=[merge_target, qa_data.organization_id],
+                countdown=settings.QA_MERGE_DELAY_SECONDS,
             )
 
-            logger.info(f"Similar questions: {similar_questions}")
-
-            if similar_questions and similar_questions[0][1] < 0.25:  # Adjust threshold as needed
-                # Update existing question
-                existing_doc = similar_questions[0][0]
-                updated_content = await self.merge_questions(existing_doc.page_content, qa_data.question)
-                existing_doc.page_content = updated_content
-                vector_store.update_document(document_id=existing_doc.metadata['id'], document=existing_doc)
-                return QuestionAnswerResponse(id=existing_doc.metadata['id'], question=qa_data.question, answer=qa_data.answer, organization_id=qa_data.organization_id)
-            else:
-                # Add new question
+        return QuestionAnswerResponse(
+            id=qa_id,
+            question=qa_data.question,
+            answer=qa_data.answer,
+            organization_id=qa_data.organization_id,
+            merge_target=merge_target,
+        )
+
+    @staticmethod
+    def format_content(question: str, answer: str) -> str:
+        return f"""Q: {question}
+A: {answer}"""
+
+    async def import_question_answers(self, items: List[QuestionAnswerCreate]) -> QuestionAnswerBulkResponse:
+        """Add many QA pairs at once.
+
+        All pairs are embedded in batches. Near-duplicates (squared L2 distance
+        below ``QA_DUPLICATE_DISTANCE`` on normalized vectors) are grouped
+        within the batch, and each group's first pair is checked against the
+        store. Every pair is written in bulk; duplicates are stored tagged
+        with ``merge_target`` and queued like single adds, so a merge that
+        fails or loses its target leaves them as standalone entries.
+        """
+        contents = [self.format_content(item.question, item.answer) for item in items]
+        vectors = np.asarray(await embed_in_batches(self.embeddings, contents), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        ids: List[str] = [None] * len(items)
+        pending_merges: Dict[str, List[str]] = defaultdict(list)
+        merge_organizations: Dict[str, str] = {}
+        added = duplicates_in_batch = duplicates_of_existing = 0
+
+        by_organization = defaultdict(list)
+        for idx, item in enumerate(items):
+            by_organization[item.organization_id].append(idx)
+
+        for organization_id, indexes in by_organization.items():
+            leaders = await run_blocking(self._group_duplicates, vectors[indexes])
+            leader_indexes = sorted({indexes[leader] for leader in leaders})
+            matches = await self._find_stored_duplicates(organization_id, vectors[leader_indexes])
+            stored_match = dict(zip(leader_indexes, matches))
+
+            new_ids, merge_targets = [], []
+            for position, idx in enumerate(indexes):
+                leader_idx = indexes[leaders[position]]
                 qa_id = str(uuid.uuid4())
-                content = f"""Q: {qa_data.question}
-A: {qa_data.answer}"""
-                new_doc = Document(
-                    page_content=content,
-                    metadata={"id": qa_id, "organization_id": qa_data.organization_id},
-                    id=qa_id
+                if stored_match[leader_idx] is not None:
+                    merge_target = stored_match[leader_idx]
+                    duplicates_of_existing += 1
+                elif leader_idx == idx:
+                    merge_target = None
+                    added += 1
+                else:
+                    merge_target = ids[leader_idx]
+                    duplicates_in_batch += 1
+                new_ids.append(qa_id)
+                merge_targets.append(merge_target)
+                ids[idx] = merge_target or qa_id
+                if merge_target:
+                    pending_merges[merge_target].append(qa_id)
+                    merge_organizations[merge_target] = organization_id
+
+            await self._write_bulk(
+                organization_id, new_ids, [contents[idx] for idx in indexes], vectors[indexes], merge_targets
+            )
+            await self._invalidate_answers(organization_id)
+
+        for merge_target, question_ids in pending_merges.items():
+            if await run_blocking(self.merge_queue.add, merge_target, *question_ids):
+                celery_app.send_task(
+                    'app.tasks.question_answer.merge_pending_questions',
+                    args=[merge_target, merge_organizations[merge_target]],
+                    countdown=settings.QA_MERGE_DELAY_SECONDS,
                 )
-                vector_store.add_documents(
-                    documents=[new_doc],
-                    ids=[qa_id]
+
+        logger.info(
+            f"Imported {len(items)} QA pairs: {added} added, {duplicates_in_batch} in-batch duplicates, "
+            f"{duplicates_of_existing} duplicates of stored entries, {len(pending_merges)} merges queued"
+        )
+        return QuestionAnswerBulkResponse(
+            received=len(items),
+            added=added,
+            duplicates_in_batch=duplicates_in_batch,
+            duplicates_of_existing=duplicates_of_existing,
+            merges_queued=len(pending_merges),
+            ids=ids,
+        )
+
+    @staticmethod
+    def _group_duplicates(vectors: np.ndarray, max_distance: float = None, block_size: int = 1024) -> List[int]:
+        """For each row, the position of the earlier row it duplicates (itself if none).
+
+        Rows are compared in blocks so the full similarity matrix is never
+        materialized. A row joins the first earlier group leader it is close to.
+        """
+        # For unit vectors, squared L2 distance = 2 - 2 * cosine similarity
+        if max_distance is None:
+            max_distance = settings.QA_DUPLICATE_DISTANCE
+        min_similarity = 1 - max_distance / 2
+        leaders = list(range(len(vectors)))
+        is_leader = np.zeros(len(vectors), dtype=bool)
+        for start in range(0, len(vectors), block_size):
+            end = min(start + block_size, len(vectors))
+            similarities = vectors[start:end] @ vectors[:end].T
+            for row in range(start, end):
+                candidates = np.flatnonzero((similarities[row - start, :row] >= min_similarity) & is_leader[:row])
+                if candidates.size:
+                    leaders[row] = int(candidates[0])
+                else:
+                    is_leader[row] = True
+        return leaders
+
+    async def _find_stored_duplicates(self, organization_id: str, vectors: np.ndarray) -> List[str]:
+        """Id of the entry each vector should be merged into if it duplicates a
+        stored one, else None. A match that is itself waiting to be merged
+        resolves to its ``merge_target``, as in ``add_question_answer``."""
+        collection = await run_blocking(self.collections.read_collection, organization_id)
+        matches = []
+        batch_size = settings.QA_BULK_QUERY_BATCH_SIZE
+        for start in range(0, len(vectors), batch_size):
+            result = await run_blocking(
+                collection.query,
+                query_embeddings=vectors[start:start + batch_size].tolist(),
+                n_results=1,
+                where={"organization_id": organization_id},
+                include=["distances", "metadatas"],
+            )
+            for ids, distances, metadatas in zip(result["ids"], result["distances"], result["metadatas"]):
+                if ids and distances[0] < settings.QA_DUPLICATE_DISTANCE:
+                    matches.append((metadatas[0] or {}).get("merge_target") or ids[0])
+                else:
+                    matches.append(None)
+        return matches
+
+    async def _write_bulk(
+        self,
+        organization_id: str,
+        ids: List[str],
+        contents: List[str],
+        vectors: np.ndarray,
+        merge_targets: List[Optional[str]],
+    ):
+        metadatas = []
+        for qa_id, merge_target in zip(ids, merge_targets):
+            metadata = {"id": qa_id, "organization_id": organization_id}
+            if merge_target:
+                metadata["merge_target"] = merge_target
+            metadatas.append(metadata)
+        collections = await self._write_collections(organization_id)
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            for collection in collections:
+                await run_blocking(
+                    collection.upsert,
+                    ids=batch_ids,
+                    embeddings=vectors[start:start + batch_size].tolist(),
+                    documents=contents[start:start + batch_size],
+                    metadatas=metadatas[start:start + batch_size],
                 )
-                return QuestionAnswerResponse(id=qa_id, question=qa_data.question, answer=qa_data.answer, organization_id=qa_data.organization_id)
 
-    async def get_relevant_questions(self, search_params: Union[QuestionAnswerSearch, ChatRequest]) -> List[Document]:
-        with db_manager.get_client() as client:
-            if not client:
-                raise Exception("Failed to connect to the database")
-
-            vector_store = Chroma(
-                client=client,
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
+    async def merge_into(self, question_id: str, contents: List[str], organization_id: str = None) -> bool:
+        """Merge ``contents`` into the stored entry ``question_id`` and re-embed it.
+
+        Holds the entry's merge lock, so queued merges and compaction merging
+        into the same entry take turns instead of overwriting each other.
+        """
+        async with self._entry_lock(question_id):
+            return await self._merge_into(question_id, contents, organization_id)
+
+    async def _merge_into(self, question_id: str, contents: List[str], organization_id: str = None) -> bool:
+        organization_id, existing = await self._locate([question_id], organization_id, ("documents",))
+        if existing is None:
+            logger.warning(f"Question {question_id} no longer exists, dropping {len(contents)} merges")
+            return False
+
+        merged = await self.merge_questions(existing["documents"][0], *contents)
+        embedding = await run_blocking(self.embeddings.embed_documents, [merged])
+        for collection in await self._write_collections(organization_id):
+            await run_blocking(collection.update, ids=[question_id], embeddings=embedding, documents=[merged])
+        await self._invalidate_answers(organization_id)
+        return True
+
+    async def merge_pending(self, target_id: str, organization_id: str = None) -> int:
+        """Merge every pair queued for ``target_id`` into it with one LLM call.
+
+        Merged pairs are deleted. If the target is gone, the pairs stay as
+        standalone entries. Returns the number of pairs merged.
+
+        Runs under the target's merge lock, and the target stays marked as
+        scheduled until the merge is done: pairs arriving meanwhile get a
+        follow-up task afterwards instead of a concurrent one. A failed merge
+        keeps the marker, so its retry picks up the requeued pairs.
+        """
+        async with self._entry_lock(target_id):
+            merged = await self._merge_pending(target_id, organization_id)
+        if await run_blocking(self.merge_queue.finish, target_id):
+            celery_app.send_task(
+                'app.tasks.question_answer.merge_pending_questions',
+                args=[target_id, organization_id],
+                countdown=settings.QA_MERGE_DELAY_SECONDS,
             )
+        return merged
+
+    async def _merge_pending(self, target_id: str, organization_id: str = None) -> int:
+        question_ids = await run_blocking(self.merge_queue.claim, target_id)
+        if not question_ids:
+            return 0
+        try:
+            organization_id, pending = await self._locate(question_ids, organization_id, ("documents",))
+            if pending is None:
+                return 0
+            collections = await self._write_collections(organization_id)
+            merged = await self._merge_into(target_id, pending["documents"], organization_id)
+            if not merged:
+                for collection in collections:
+                    await run_blocking(
+                        collection.update,
+                        ids=pending["ids"],
+                        metadatas=[
+                            {key: value for key, value in (metadata or {}).items() if key != "merge_target"}
+                            for metadata in pending["metadatas"]
+                        ],
+                    )
+                return 0
+            for collection in collections:
+                await run_blocking(collection.delete, ids=pending["ids"])
+            await run_blocking(self.merge_queue.mark_merged, pending["ids"], target_id)
+        except Exception:
+            await run_blocking(self.merge_queue.requeue, target_id, question_ids)
+            raise
+        logger.info(f"Merged {len(pending['ids'])} pending QA pairs into {target_id}")
+        return len(pending["ids"])
 
-            results = vector_store.similarity_search_with_score(
+    async def compact_organization(self, organization_id: str) -> dict:
+        """Merge clusters of near-duplicate entries of one organization.
+
+        Exports the organization's entries with their vectors, clusters them
+        in memory (squared L2 below ``QA_COMPACTION_DISTANCE``) and merges
+        each cluster into its first entry with one LLM call per cluster.
+        Entries still waiting on a queued merge, or with merges queued into
+        them, are left alone.
+        """
+        collection = await run_blocking(self.collections.read_collection, organization_id)
+        ids, documents, vectors = [], [], []
+        offset = 0
+        page_size = settings.QA_COMPACTION_PAGE_SIZE
+        while True:
+            page = await run_blocking(
+                collection.get,
+                where={"organization_id": organization_id},
+                include=["documents", "metadatas", "embeddings"],
+                limit=page_size,
+                offset=offset,
+            )
+            for qa_id, document, metadata, vector in zip(page["ids"], page["documents"], page["metadatas"], page["embeddings"]):
+                if (metadata or {}).get("merge_target"):
+                    continue
+                ids.append(qa_id)
+                documents.append(document)
+                vectors.append(vector)
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+
+        busy = await run_blocking(self.merge_queue.with_pending, ids) if ids else set()
+        if busy:
+            keep = [position for position, qa_id in enumerate(ids) if qa_id not in busy]
+            ids = [ids[position] for position in keep]
+            documents = [documents[position] for position in keep]
+            vectors = [vectors[position] for position in keep]
+
+        entries_before = len(ids)
+        clusters = defaultdict(list)
+        if ids:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+            leaders = await run_blocking(self._group_duplicates, matrix, settings.QA_COMPACTION_DISTANCE)
+            for position, leader in enumerate(leaders):
+                if position != leader:
+                    clusters[leader].append(position)
+
+        # Oversized clusters are merged in slices so each prompt stays small
+        max_members = max(1, settings.QA_COMPACTION_MAX_CLUSTER_SIZE - 1)
+        semaphore = asyncio.Semaphore(max(1, settings.QA_COMPACTION_CONCURRENCY))
+
+        async def _merge_cluster(leader: int, members: List[int]) -> int:
+            removed = 0
+            async with semaphore:
+                for start in range(0, len(members), max_members):
+                    batch = members[start:start + max_members]
+                    if not await self.merge_into(ids[leader], [documents[position] for position in batch], organization_id):
+                        break
+                    batch_ids = [ids[position] for position in batch]
+                    for target in await self._write_collections(organization_id):
+                        await run_blocking(target.delete, ids=batch_ids)
+                    await run_blocking(self.merge_queue.mark_merged, batch_ids, ids[leader])
+                    removed += len(batch)
+            return removed
+
+        results = await asyncio.gather(
+            *(_merge_cluster(leader, members) for leader, members in clusters.items()),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        for failure in failures:
+            logger.error(f"Failed to merge a QA cluster for {organization_id}: {str(failure)}")
+        removed = sum(result for result in results if not isinstance(result, Exception))
+
+        report = {
+            "organization_id": organization_id,
+            "entries_before": entries_before,
+            "entries_after": entries_before - removed,
+            "clusters": len(clusters),
+            "clusters_failed": len(failures),
+            "entries_removed": removed,
+            "shrink_ratio": removed / entries_before if entries_before else 0.0,
+            "completed_at": time.time(),
+        }
+        await run_blocking(self.merge_queue.save_compaction_report, organization_id, report)
+        logger.info(
+            f"Compacted QA entries for {organization_id}: {entries_before} -> {report['entries_after']} "
+            f"({len(clusters)} clusters)"
+        )
+        return report
+
+    async def get_merge_state(self, question_id: str, organization_id: str = None) -> QuestionMergeStateResponse:
+        _, existing = await self._locate([question_id], organization_id)
+        if existing is None:
+            merged_into = await run_blocking(self.merge_queue.merged_into, question_id)
+            if merged_into is None:
+                raise AppException(status_code=404, detail=f"Question {question_id} not found")
+            return QuestionMergeStateResponse(question_id=question_id, status="merged", merge_target=merged_into)
+
+        merge_target = (existing["metadatas"][0] or {}).get("merge_target")
+        return QuestionMergeStateResponse(
+            question_id=question_id,
+            status="pending" if merge_target else "none",
+            merge_target=merge_target,
+            pending_merges=await run_blocking(self.merge_queue.pending, question_id),
+        )
+
+    async def get_relevant_questions(self, search_params: Union[QuestionAnswerSearch, ChatRequest]) -> List[Document]:
+        query_embedding = await run_blocking(self.embeddings.embed_query, search_params.query)
+        return await self.get_relevant_questions_by_vector(search_params, query_embedding)
+
+    async def get_relevant_questions_by_vector(
+        self,
+        search_params: Union[QuestionAnswerSearch, ChatRequest],
+        query_embedding: List[float],
+    ) -> List[Document]:
+        collection_name = await run_blocking(self.collections.read_name, search_params.organization_id)
+        vector_store = await run_blocking(db_manager.get_vector_store, collection_name, self.embeddings)
+
+        results = await run_blocking(
+            vector_store.similarity_search_by_vector_with_relevance_scores,
+            query_embedding,
+            k=20,
+            filter={"organization_id": search_params.organization_id}
+        )
+
+        if not results:
+            logger.info("No questions found in initial search")
+            return []
+
+        logger.info(f"Retrieved {results} questions from vector store")
+
+        try:
+            final_docs = await run_blocking(
+                self.reranker.rerank_documents,
                 search_params.query,
-                k=20,
-                filter={"organization_id": search_params.organization_id}
+                [doc for doc, _ in results],
+                top_n=10,  # Return top 10 most relevant results
+                threshold=0.15,  # Adjust this threshold as needed
+                organization_id=search_params.organization_id,
             )
+        except Exception as e:
+            logger.error(f"Reranking failed: {str(e)}")
+            raise AppException(status_code=500, detail="Question reranking failed")
 
-            if not results:
-                logger.info("No questions found in initial search")
-                return []
+        logger.info(f"Successfully retrieved and reranked {len(final_docs)} questions")
+        return final_docs
 
-            logger.info(f"Retrieved {results} questions from vector store")
+    async def delete_question(self, question_id: str, organization_id: str = None) -> dict:
+        organization_id, existing = await self._locate([question_id], organization_id)
+        if existing is not None:
+            for collection in await self._write_collections(organization_id):
+                await run_blocking(collection.delete, ids=[question_id])
+            await self._invalidate_answers(organization_id)
+        return {"message": "Question deleted successfully"}
 
-            documents = [doc.page_content for doc, _ in results]
-            try:
-                reranked_results = self.reranker.rerank(
-                    documents=documents,
-                    query=search_params.query,
-                    top_n=10  # Return top 10 most relevant results
-                )
-            except Exception as e:
-                logger.error(f"Reranking failed: {str(e)}")
-                raise AppException(status_code=500, detail="Question reranking failed")
-            
-            logger.info(f"Reranked results: {reranked_results}")
-
-            final_docs = []
-            for item in reranked_results:
-                idx = item.get('index')
-                relevance_score = item.get('relevance_score')
-                if idx is None or relevance_score is None:
-                    continue
-                doc, _ = results[idx]
-                doc.metadata['relevance_score'] = relevance_score
-                if relevance_score > 0.15:  # Adjust this threshold as needed
-                    final_docs.append(doc)
-
-            logger.info(f"Successfully retrieved and reranked {len(final_docs)} questions")
-            return final_docs
-
-    async def delete_question(self, question_id: str) -> dict:
-        with db_manager.get_client() as client:
-            if not client:
-                raise Exception("Failed to connect to the database")
-
-            collection = client.get_or_create_collection(self.collection_name)
-            collection.delete(ids=[question_id])
-            return {"message": "Question deleted successfully"}
+    async def _locate(
+        self,
+        question_ids: List[str],
+        organization_id: Optional[str] = None,
+        include: Tuple[str, ...] = (),
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """Fetch stored entries by id, with the organization they belong to.
+
+        Without ``organization_id`` every collection is searched, since
+        sharded organizations keep their entries in their own collection.
+        """
+        names = await run_blocking(self.collections.lookup_names, organization_id)
+        for name in names:
+            collection = await run_blocking(db_manager.get_collection, name)
+            existing = await run_blocking(collection.get, ids=question_ids, include=["metadatas", *include])
+            if existing["ids"]:
+                return (existing["metadatas"][0] or {}).get("organization_id") or organization_id, existing
+        return organization_id, None
+
+    @asynccontextmanager
+    async def _entry_lock(self, question_id: str):
+        """Serialize read-modify-write merges into one entry across processes."""
+        deadline = time.monotonic() + settings.QA_MERGE_LOCK_WAIT_SECONDS
+        while True:
+            token = await run_blocking(self.merge_queue.lock_entry, question_id, settings.QA_MERGE_LOCK_SECONDS)
+            if token:
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Timed out waiting for the merge lock of {question_id}")
+            await asyncio.sleep(0.5)
+        try:
+            yield
+        finally:
+            await run_blocking(self.merge_queue.unlock_entry, question_id, token)
+
+    async def _write_collections(self, organization_id: str) -> list:
+        return await run_blocking(self.collections.write_collections, organization_id)
+
+    async def _invalidate_answers(self, organization_id: str):
+        if self.answer_cache is not None and organization_id:
+            await run_blocking(self.answer_cache.invalidate, organization_id)
         
-    async def merge_questions(self, previous_question: str, new_question: str) -> str:
-        prompt = f"""I will provide you with two similar questions. I am trying to build a knowledge base and repeating similar questions to store multiple times defeat the purpose.
+    async def merge_questions(self, previous_question: str, *new_questions: str) -> str:
+        if len(new_questions) == 1:
+            prompt = f"""I will provide you with two similar questions. I am trying to build a knowledge base and repeating similar questions to store multiple times defeat the purpose.
 Can you please create a new question/answer pair combining both. Please include all key informations from both of the question.
 First: {previous_question}
-Second: {new_question}
+Second: {new_questions[0]}
+Please only respond with the only relevant information without missing any key context.
+"""
+        else:
+            others = "\n".join(f"Similar {idx + 1}: {question}" for idx, question in enumerate(new_questions))
+            prompt = f"""I will provide you with an existing question and several similar questions. I am trying to build a knowledge base and repeating similar questions to store multiple times defeat the purpose.
+Can you please create a single new question/answer pair combining all of them. Please include all key informations from every question.
+Existing: {previous_question}
+{others}
 Please only respond with the only relevant information without missing any key context.
 """
-        response = self.llm.invoke(prompt)
+        response = await self.llm.ainvoke(prompt)
         # Extract the content from the response
         if isinstance(response.content, str):
             return response.content
@@ -144,4 +544,4 @@ Please only respond with the only relevant information without missing any key c
             return ", ".join([str(item) for item in response.content if isinstance(item, str)])
         else:
             # If it's neither a string nor a list, convert to string
-            return str(response.content)
\ No newline at end of file
+            return str(response.content)
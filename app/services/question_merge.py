@@ -0,0 +1,103 @@
+# app/services/question_merge.py
+
+import json
+import uuid
+from typing import List, Optional, Set
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+class QuestionMergeQueue:
+    """Redis bookkeeping for QA pairs waiting to be merged into an entry.
+
+    ``qamerge:{target}:pending`` holds the ids of pairs that duplicate
+    ``target``; ``qamerge:{target}:scheduled`` exists while a merge task for
+    it is queued or running, so pairs arriving in the meantime join that task instead
+    of scheduling their own. ``qamerge:{id}:lock`` is held while an entry
+    is being merged into, so concurrent merges cannot overwrite each other.
+    """
+
+    _UNLOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, prefix: str = "qamerge"):
+        self.prefix = prefix
+
+    def _key(self, question_id: str, name: str) -> str:
+        return f"{self.prefix}:{question_id}:{name}"
+
+    def _schedule(self, target_id: str) -> bool:
+        # Expire the marker eventually so a lost task cannot block merges forever
+        ttl = settings.QA_MERGE_DELAY_SECONDS + settings.CELERY_VISIBILITY_TIMEOUT
+        return bool(get_redis().set(self._key(target_id, "scheduled"), 1, nx=True, ex=ttl))
+
+    def add(self, target_id: str, *question_ids: str) -> bool:
+        """Queue ``question_ids`` for merging; True if a merge task must be scheduled."""
+        get_redis().sadd(self._key(target_id, "pending"), *question_ids)
+        return self._schedule(target_id)
+
+    def claim(self, target_id: str) -> List[str]:
+        """Take every pending id for ``target_id``. The ``scheduled`` marker
+        stays until ``finish``, so pairs queued meanwhile wait for this merge
+        instead of starting a second one."""
+        pipe = get_redis().pipeline()
+        pipe.smembers(self._key(target_id, "pending"))
+        pipe.delete(self._key(target_id, "pending"))
+        pending, _ = pipe.execute()
+        return sorted(question_id.decode() for question_id in pending)
+
+    def finish(self, target_id: str) -> bool:
+        """Clear the ``scheduled`` marker after a merge. True if pairs were
+        queued meanwhile and a new merge task must be scheduled for them."""
+        pipe = get_redis().pipeline()
+        pipe.delete(self._key(target_id, "scheduled"))
+        pipe.scard(self._key(target_id, "pending"))
+        _, remaining = pipe.execute()
+        return bool(remaining) and self._schedule(target_id)
+
+    def requeue(self, target_id: str, question_ids: List[str]):
+        if question_ids:
+            get_redis().sadd(self._key(target_id, "pending"), *question_ids)
+
+    def pending(self, target_id: str) -> List[str]:
+        return sorted(question_id.decode() for question_id in get_redis().smembers(self._key(target_id, "pending")))
+
+    def mark_merged(self, question_ids: List[str], target_id: str):
+        pipe = get_redis().pipeline()
+        for question_id in question_ids:
+            pipe.set(self._key(question_id, "merged_into"), target_id, ex=settings.QA_MERGE_RECORD_TTL_SECONDS)
+        pipe.execute()
+
+    def with_pending(self, question_ids: List[str]) -> Set[str]:
+        """The ids among ``question_ids`` that have merges queued into them."""
+        pipe = get_redis().pipeline(transaction=False)
+        for question_id in question_ids:
+            pipe.exists(self._key(question_id, "pending"))
+        return {question_id for question_id, exists in zip(question_ids, pipe.execute()) if exists}
+
+    def lock_entry(self, question_id: str, ttl: int) -> Optional[str]:
+        """Take the merge lock of an entry; returns the token to release it with."""
+        token = uuid.uuid4().hex
+        if get_redis().set(self._key(question_id, "lock"), token, nx=True, ex=ttl):
+            return token
+        return None
+
+    def unlock_entry(self, question_id: str, token: str):
+        # Only release our own lock, not one taken after ours expired
+        get_redis().eval(self._UNLOCK, 1, self._key(question_id, "lock"), token)
+
+    def merged_into(self, question_id: str) -> Optional[str]:
+        target_id = get_redis().get(self._key(question_id, "merged_into"))
+        return target_id.decode() if target_id else None
+
+    def save_compaction_report(self, organization_id: str, report: dict):
+        get_redis().set(f"{self.prefix}:compaction:{organization_id}", json.dumps(report))
+
+    def compaction_report(self, organization_id: str) -> Optional[dict]:
+        data = get_redis().get(f"{self.prefix}:compaction:{organization_id}")
+        return json.loads(data) if data else None
+
+    def lock_compaction(self, organization_id: str, ttl: int) -> bool:
+        return bool(get_redis().set(f"{self.prefix}:compaction:{organization_id}:lock", 1, nx=True, ex=ttl))
+
+    def unlock_compaction(self, organization_id: str):
+        get_redis().delete(f"{self.prefix}:compaction:{organization_id}:lock")
@@ -0,0 +1,209 @@
+# app/services/registry.py
+
+import os
+import threading
+import requests
+from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from unstructured_client import UnstructuredClient
+from unstructured_client.utils import BackoffStrategy, RetryConfig
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.services.chat import ChatService
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.document_manifest import DocumentManifest
+from app.services.answer_cache import create_answer_cache
+from app.services.collection_router import CollectionRouter
+from app.services.embedding_cache import CachedEmbeddings, create_embedding_store
+from app.services.organization import OrganizationService
+from app.services.organization_registry import OrganizationRegistry
+from app.services.question_answer import QuestionAnswerService
+from app.services.reranker import create_reranker
+from app.services.vector_db import VectorDBService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Process-wide holder for services and the clients they share.
+
+    Everything is built lazily on first use (or eagerly via ``startup``) and
+    then reused by every request handled by this worker process.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
+        os.environ["COHERE_API_KEY"] = settings.COHERE_API_KEY
+        self._lock = threading.RLock()
+        self._services = {}
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = ServiceRegistry()
+        return cls._instance
+
+    def _get_or_create(self, name: str, factory):
+        if name not in self._services:
+            with self._lock:
+                if name not in self._services:
+                    self._services[name] = factory()
+                    logger.info(f"Initialized shared {name}")
+        return self._services[name]
+
+    # Shared clients
+
+    def embeddings(self):
+        return self._get_or_create("embeddings", self._create_embeddings)
+
+    def _create_embeddings(self):
+        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return embeddings
+        return CachedEmbeddings(embeddings, store=create_embedding_store())
+
+    def llm(self):
+        return self._get_or_create("llm", lambda: ChatGoogleGenerativeAI(model="gemini-1.5-flash"))
+
+    def reranker(self):
+        return self._get_or_create("reranker", create_reranker)
+
+    def answer_cache(self):
+        return self._get_or_create("answer_cache", create_answer_cache)
+
+    def document_manifest(self):
+        return self._get_or_create(
+            "document_manifest",
+            lambda: DocumentManifest(collections=self.document_collections()),
+        )
+
+    def document_collections(self) -> CollectionRouter:
+        return self._get_or_create("document_collections", lambda: CollectionRouter("documents"))
+
+    def question_collections(self) -> CollectionRouter:
+        return self._get_or_create("question_collections", lambda: CollectionRouter("questions_answers"))
+
+    def organizations(self) -> OrganizationRegistry:
+        return self._get_or_create("organizations", OrganizationRegistry)
+
+    def http_session(self):
+        return self._get_or_create("http_session", requests.Session)
+
+    def unstructured_client(self):
+        return self._get_or_create(
+            "unstructured_client",
+            lambda: UnstructuredClient(
+                api_key_auth=settings.UNSTRUCTURED_API_KEY,
+                client=self.http_session(),
+                server_url=settings.UNSTRUCTURED_API_URL + "/general/v0/general",
+                retry_config=RetryConfig(
+                    strategy="backoff",
+                    retry_connection_errors=True,
+                    backoff=BackoffStrategy(
+                        initial_interval=500,
+                        max_interval=60000,
+                        exponent=1.5,
+                        max_elapsed_time=900000,
+                    ),
+                ),
+            ),
+        )
+
+    # Services
+
+    def document_ingestion_service(self) -> DocumentIngestionService:
+        return self._get_or_create(
+            "document_ingestion_service",
+            lambda: DocumentIngestionService(
+                embeddings=self.embeddings(),
+                llm=self.llm(),
+                unstructured_client=self.unstructured_client(),
+                manifest=self.document_manifest(),
+            ),
+        )
+
+    def vector_db_service(self) -> VectorDBService:
+        return self._get_or_create(
+            "vector_db_service",
+            lambda: VectorDBService(
+                embeddings=self.embeddings(),
+                answer_cache=self.answer_cache(),
+                manifest=self.document_manifest(),
+                collections=self.document_collections(),
+            ),
+        )
+
+    def question_answer_service(self) -> QuestionAnswerService:
+        return self._get_or_create(
+            "question_answer_service",
+            lambda: QuestionAnswerService(
+                embeddings=self.embeddings(),
+                llm=self.llm(),
+                reranker=self.reranker(),
+                answer_cache=self.answer_cache(),
+                collections=self.question_collections(),
+            ),
+        )
+
+    def organization_service(self) -> OrganizationService:
+        return self._get_or_create(
+            "organization_service",
+            lambda: OrganizationService(org_registry=self.organizations()),
+        )
+
+    def chat_service(self) -> ChatService:
+        return self._get_or_create(
+            "chat_service",
+            lambda: ChatService(
+                qa_service=self.question_answer_service(),
+                vector_db_service=self.vector_db_service(),
+                llm=self.llm(),
+                reranker=self.reranker(),
+                embeddings=self.embeddings(),
+                answer_cache=self.answer_cache(),
+            ),
+        )
+
+    # Lifecycle
+
+    def startup(self):
+        self.organizations().start()
+        self.document_ingestion_service()
+        self.organization_service()
+        self.chat_service()
+
+    def shutdown(self):
+        with self._lock:
+            organizations = self._services.get("organizations")
+            if organizations is not None:
+                organizations.stop()
+            session = self._services.get("http_session")
+            if session is not None:
+                session.close()
+            self._services.clear()
+
+
+registry = ServiceRegistry.get_instance()
+
+
+# FastAPI dependency providers
+
+def get_document_ingestion_service() -> DocumentIngestionService:
+    return registry.document_ingestion_service()
+
+
+def get_vector_db_service() -> VectorDBService:
+    return registry.vector_db_service()
+
+
+def get_question_answer_service() -> QuestionAnswerService:
+    return registry.question_answer_service()
+
+
+def get_organization_service() -> OrganizationService:
+    return registry.organization_service()
+
+
+def get_chat_service() -> ChatService:
+    return registry.chat_service()
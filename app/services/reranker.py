@@ -0,0 +1,195 @@
+# app/services/reranker.py
+
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List
+from langchain.schema import Document
+from langchain_cohere import CohereRerank
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.utils.bm25 import idf, term_score, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class BaseReranker:
+    """Scores candidate texts against a query.
+
+    ``rerank`` returns Cohere-style results: a list of
+    ``{"index": int, "relevance_score": float}`` sorted best first, with
+    ``relevance_score`` in [0, 1].
+    """
+
+    name = "base"
+
+    def rerank(self, documents: List[str], query: str, top_n: int = 3, organization_id: str = None) -> List[dict]:
+        raise NotImplementedError
+
+    def rerank_documents(
+        self,
+        query: str,
+        docs: List[Document],
+        top_n: int,
+        threshold: float,
+        organization_id: str = None,
+    ) -> List[Document]:
+        """Rerank ``docs`` and keep those scoring above ``threshold``."""
+        reranked_results = self.rerank(
+            documents=[doc.page_content for doc in docs],
+            query=query,
+            top_n=top_n,
+            organization_id=organization_id,
+        )
+
+        reranked_docs = []
+        for item in reranked_results:
+            idx = item.get('index')
+            relevance_score = item.get('relevance_score')
+            if idx is None or relevance_score is None:
+                continue
+            doc = docs[idx]
+            doc.metadata['relevance_score'] = relevance_score
+            if relevance_score > threshold:
+                reranked_docs.append(doc)
+        return reranked_docs
+
+
+class CohereReranker(BaseReranker):
+    name = "cohere"
+
+    def __init__(self, model: str = "rerank-english-v2.0"):
+        self.client = CohereRerank(model=model)
+
+    def rerank(self, documents: List[str], query: str, top_n: int = 3, organization_id: str = None) -> List[dict]:
+        return self.client.rerank(documents=documents, query=query, top_n=top_n)
+
+
+class LexicalReranker(BaseReranker):
+    """In-process BM25 reranker over the candidate set.
+
+    Candidates are ordered by BM25. ``relevance_score`` is the IDF-weighted
+    share of query terms that the candidate contains, so it stays comparable
+    to the thresholds used with Cohere scores.
+    """
+
+    name = "lexical"
+
+    def rerank(self, documents: List[str], query: str, top_n: int = 3, organization_id: str = None) -> List[dict]:
+        query_terms = set(tokenize(query))
+        if not documents or not query_terms:
+            return []
+
+        doc_terms = [Counter(tokenize(text)) for text in documents]
+        num_docs = len(documents)
+        avg_doc_len = sum(sum(terms.values()) for terms in doc_terms) / num_docs
+        term_idf = {
+            term: idf(num_docs, sum(1 for terms in doc_terms if term in terms))
+            for term in query_terms
+        }
+        total_idf = sum(term_idf.values())
+
+        scored = []
+        for idx, terms in enumerate(doc_terms):
+            doc_len = sum(terms.values())
+            bm25 = sum(term_score(terms[term], doc_len, avg_doc_len, term_idf[term]) for term in query_terms)
+            coverage = sum(term_idf[term] for term in query_terms if term in terms) / total_idf
+            scored.append((bm25, coverage, idx))
+
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [
+            {"index": idx, "relevance_score": coverage}
+            for bm25, coverage, idx in scored[:top_n]
+        ]
+
+
+class MemoizedReranker(BaseReranker):
+    """LRU memoization of (query, candidate set, top_n) -> rerank results."""
+
+    def __init__(self, backend: BaseReranker, max_entries: int = None):
+        self.backend = backend
+        self.name = backend.name
+        self.max_entries = max_entries or settings.RERANKER_MEMO_ENTRIES
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, documents: List[str], query: str, top_n: int) -> str:
+        digest = hashlib.sha256()
+        for part in [self.name, str(top_n), query, *documents]:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def rerank(self, documents: List[str], query: str, top_n: int = 3, organization_id: str = None) -> List[dict]:
+        key = self._key(documents, query, top_n)
+        with self._lock:
+            cached = self._memo.get(key)
+            if cached is not None:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return [dict(item) for item in cached]
+            self.misses += 1
+
+        results = [
+            {"index": item.get('index'), "relevance_score": item.get('relevance_score')}
+            for item in self.backend.rerank(documents=documents, query=query, top_n=top_n, organization_id=organization_id)
+        ]
+        with self._lock:
+            self._memo[key] = results
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return [dict(item) for item in results]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._memo),
+        }
+
+
+class RoutingReranker(BaseReranker):
+    """Picks a backend per organization, falling back to a default backend."""
+
+    name = "routing"
+
+    def __init__(self, backends: Dict[str, BaseReranker], default: str, organization_backends: Dict[str, str] = None):
+        if default not in backends:
+            raise ValueError(f"Unknown reranker backend: {default}")
+        self.backends = backends
+        self.default = default
+        self.organization_backends = organization_backends or {}
+
+    def backend_for(self, organization_id: str = None) -> BaseReranker:
+        name = self.organization_backends.get(organization_id, self.default)
+        backend = self.backends.get(name)
+        if backend is None:
+            logger.warning(f"Unknown reranker backend '{name}' for {organization_id}, using {self.default}")
+            backend = self.backends[self.default]
+        return backend
+
+    def rerank(self, documents: List[str], query: str, top_n: int = 3, organization_id: str = None) -> List[dict]:
+        return self.backend_for(organization_id).rerank(
+            documents=documents, query=query, top_n=top_n, organization_id=organization_id
+        )
+
+    def stats(self) -> dict:
+        return {
+            name: backend.stats() for name, backend in self.backends.items() if hasattr(backend, "stats")
+        }
+
+
+def create_reranker() -> RoutingReranker:
+    backends = {"lexical": MemoizedReranker(LexicalReranker())}
+    names = {settings.RERANKER_BACKEND, *settings.RERANKER_ORGANIZATION_BACKENDS.values()}
+    if "cohere" in names:
+        backends["cohere"] = MemoizedReranker(CohereReranker())
+    return RoutingReranker(
+        backends,
+        default=settings.RERANKER_BACKEND,
+        organization_backends=settings.RERANKER_ORGANIZATION_BACKENDS,
+    )
@@ -0,0 +1,90 @@
+# app/services/semantic_chunker.py
+
+import re
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_experimental.text_splitter import SemanticChunker
+from app.core.config import settings
+
+
+def use_derived_embeddings() -> bool:
+    """Whether chunk vectors come from the chunker's sentence embeddings.
+
+    Only applies when chunks are embedded without the topics prefix, since
+    the sentence embeddings never saw it.
+    """
+    return settings.CHUNK_EMBEDDING_MODE == "derive" and not settings.EMBED_CHUNK_TOPICS
+
+
+class EmbeddingSemanticChunker(SemanticChunker):
+    """SemanticChunker that can also return a vector for each chunk.
+
+    ``split_text_with_embeddings`` runs its own breakpoint search so it only
+    relies on the embeddings' public ``embed_documents``, not on
+    SemanticChunker internals. Each sentence is embedded on its own (no
+    neighbour buffer), breakpoints are placed where consecutive sentences
+    drift apart, and a chunk's vector is the normalized mean of its own
+    sentences' embeddings. Single-sentence texts are not embedded and get
+    ``None``. ``split_text``/``create_documents`` keep SemanticChunker's
+    behaviour.
+    """
+
+    SENTENCE_SPLIT_REGEX = r"(?<=[.?!])\s+"
+    DEFAULT_THRESHOLD_AMOUNTS = {"percentile": 95, "standard_deviation": 3, "interquartile": 1.5}
+
+    def __init__(self, embeddings, breakpoint_threshold_type: str = "percentile", min_chunk_size: int = None, **kwargs):
+        super().__init__(
+            embeddings,
+            breakpoint_threshold_type=breakpoint_threshold_type,
+            min_chunk_size=min_chunk_size,
+            **kwargs,
+        )
+        if breakpoint_threshold_type not in self.DEFAULT_THRESHOLD_AMOUNTS:
+            raise ValueError(f"Unsupported breakpoint threshold type for derived embeddings: {breakpoint_threshold_type}")
+        self.sentence_embeddings = embeddings
+        self.threshold_type = breakpoint_threshold_type
+        self.threshold_amount = kwargs.get("breakpoint_threshold_amount") or self.DEFAULT_THRESHOLD_AMOUNTS[breakpoint_threshold_type]
+        self.min_size = min_chunk_size
+
+    def _threshold(self, distances: np.ndarray) -> float:
+        if self.threshold_type == "percentile":
+            return float(np.percentile(distances, self.threshold_amount))
+        if self.threshold_type == "standard_deviation":
+            return float(np.mean(distances) + self.threshold_amount * np.std(distances))
+        q1, q3 = np.percentile(distances, [25, 75])
+        return float(np.mean(distances) + self.threshold_amount * (q3 - q1))
+
+    def split_text_with_embeddings(self, text: str) -> List[Tuple[str, Optional[List[float]]]]:
+        sentences = [sentence for sentence in re.split(self.SENTENCE_SPLIT_REGEX, text) if sentence]
+        if len(sentences) <= 1:
+            return [(text, None)]
+
+        vectors = np.asarray(self.sentence_embeddings.embed_documents(sentences), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        distances = 1 - np.sum(vectors[:-1] * vectors[1:], axis=1)
+        threshold = self._threshold(distances)
+
+        results = []
+        start = 0
+        for end in [int(idx) + 1 for idx in np.flatnonzero(distances > threshold)] + [len(sentences)]:
+            chunk = " ".join(sentences[start:end])
+            # Like SemanticChunker, a too-short chunk runs on into the next one
+            if end < len(sentences) and self.min_size and len(chunk) < self.min_size:
+                continue
+            vector = vectors[start:end].mean(axis=0)
+            norm = np.linalg.norm(vector)
+            results.append((chunk, (vector / norm if norm else vector).tolist()))
+            start = end
+        return results
+
+    def create_documents_with_embeddings(
+        self, texts: List[str]
+    ) -> Tuple[List[Document], List[Optional[List[float]]]]:
+        documents, vectors = [], []
+        for text in texts:
+            for chunk, vector in self.split_text_with_embeddings(text):
+                documents.append(Document(page_content=chunk, metadata={}))
+                vectors.append(vector)
+        return documents, vectors
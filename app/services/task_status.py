@@ -0,0 +1,103 @@
+# app/services/task_status.py
+
+import json
+from typing import AsyncIterator, Optional
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.core.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+TASK_META_PREFIX = "celery-task-meta-"
+FINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+
+def progress_channel(task_id: str) -> str:
+    return f"task_progress:{task_id}"
+
+
+def format_status(state: str, result) -> dict:
+    """Shape a Celery state and its result/meta into a status payload."""
+    if state == "PENDING":
+        return {"state": state, "status": "Pending...", "current": 0, "total": 1}
+    if state == "SUCCESS":
+        return {
+            "state": state,
+            "status": "Completed",
+            "current": 1,
+            "total": 1,
+            "result": result if isinstance(result, dict) else {"value": result},
+        }
+    if state in ("FAILURE", "REVOKED"):
+        if isinstance(result, dict):
+            message = result.get("error") or result.get("exc_message") or result.get("exc_type")
+            if isinstance(message, list):
+                message = " ".join(str(part) for part in message)
+        else:
+            message = result
+        return {"state": state, "status": str(message or state), "current": 1, "total": 1}
+
+    meta = result if isinstance(result, dict) else {}
+    return {
+        "state": state,
+        "status": meta.get("status", "" if isinstance(result, dict) else str(result)),
+        "current": meta.get("current", 0),
+        "total": meta.get("total", 1),
+        "stage": meta.get("stage"),
+    }
+
+
+async def get_task_status(task_id: str) -> dict:
+    """Read a task's state straight from the Celery result backend.
+
+    Tasks that are queued but not started have no record yet and are
+    reported as PENDING, like ``AsyncResult`` does.
+    """
+    data = await get_async_redis(settings.CELERY_REDIS_DB).get(f"{TASK_META_PREFIX}{task_id}")
+    if data is None:
+        return format_status("PENDING", None)
+    meta = json.loads(data)
+    return format_status(meta.get("status", "PENDING"), meta.get("result"))
+
+
+def publish_progress(task_id: str, state: str, meta: Optional[dict] = None):
+    """Push a progress event to subscribers of ``task_id``; never fails the task."""
+    try:
+        get_redis().publish(progress_channel(task_id), json.dumps(format_status(state, meta)))
+    except Exception as e:
+        logger.warning(f"Failed to publish progress for {task_id}: {str(e)}")
+
+
+async def stream_task_events(task_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+    """Yield status updates for ``task_id`` until it finishes.
+
+    Subscribes before reading the current status, so no update published in
+    between is lost. Yields ``None`` when nothing happened for ``heartbeat``
+    seconds, so callers can keep the connection alive.
+    """
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe(progress_channel(task_id))
+    try:
+        status = await get_task_status(task_id)
+        yield status
+        if status["state"] in FINAL_STATES:
+            return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                # Catch a final state whose event was missed (e.g. published
+                # by a worker before we subscribed to a re-queued task)
+                status = await get_task_status(task_id)
+                if status["state"] in FINAL_STATES:
+                    yield status
+                    return
+                yield None
+                continue
+            status = json.loads(message["data"])
+            yield status
+            if status["state"] in FINAL_STATES:
+                return
+    finally:
+        await pubsub.unsubscribe(progress_channel(task_id))
+        await pubsub.close()
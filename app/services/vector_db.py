@@ -1,71 +1,394 @@
 # app/services/vector_db.py
 
-from app.core.db import db_manager
 from langchain.schema import Document
-from typing import List
+from typing import Callable, List, Optional
+import asyncio
 import uuid
+from collections import defaultdict
 import os
 from app.core.config import settings
-from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from app.core.logging_config import logging
+from app.core.executor import run_blocking
+from app.services.collection_router import CollectionRouter
+from app.services.lexical_index import LexicalIndexManager, reciprocal_rank_fusion
+from app.utils.chunks import chunk_content, chunk_hash, chunk_ids, chunk_topics
+from app.services.batch_embedding import embed_batch, embed_in_batches, with_retries
 
 logger = logging.getLogger(__name__)
 
 class VectorDBService:
-    def __init__(self):
+    def __init__(self, embeddings=None, answer_cache=None, manifest=None, collections: CollectionRouter = None):
         os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
         self.collection_name = "documents"
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
-
-    async def insert_documents(self, documents: List[Document]):
-        with db_manager.get_client() as client:
-            if not client:
-                raise Exception("Failed to connect to the database")
-            
-            vector_store = Chroma(
-                client=client,
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
+        self.embeddings = embeddings or GoogleGenerativeAIEmbeddings(model="models/embedding-001", task_type="retrieval_document")
+        self.answer_cache = answer_cache
+        self.manifest = manifest
+        self.collections = collections or CollectionRouter(self.collection_name)
+        self.lexical_index = LexicalIndexManager(self.collection_name, self.collections)
+
+    async def insert_documents(
+        self,
+        documents: List[Document],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        ids: List[str] = None,
+    ) -> List[str]:
+        """Embed and store ``documents`` in batches.
+
+        Batches are embedded concurrently (bounded by
+        ``EMBEDDING_MAX_CONCURRENCY``) and each one is written to Chroma as
+        soon as its embeddings are ready. Embedding and writing are each
+        retried per batch. Ids default to ``chunk_ids``, so when the whole
+        call is retried the batches that already landed are upserted in
+        place rather than stored twice.
+        ``on_progress`` is called with (chunks written, total chunks).
+        """
+        uuids = ids or self.chunk_ids(documents)
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_MAX_CONCURRENCY))
+        written = 0
+
+        async def _process_batch(start: int):
+            nonlocal written
+            batch_ids = uuids[start:start + batch_size]
+            batch_docs = documents[start:start + batch_size]
+            async with semaphore:
+                embeddings = await embed_batch(self.embeddings, self.embedding_texts(batch_docs))
+                await self._write_batch(batch_ids, batch_docs, embeddings)
+            written += len(batch_ids)
+            if on_progress is not None:
+                on_progress(written, len(documents))
+
+        try:
+            results = await asyncio.gather(
+                *(_process_batch(start) for start in range(0, len(documents), batch_size)),
+                return_exceptions=True,
             )
+        finally:
+            for organization_id in {doc.metadata.get("organization_id") for doc in documents}:
+                await self._invalidate_answers(organization_id)
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.error(f"{len(errors)} embedding batches failed; {written}/{len(documents)} chunks were stored")
+            raise errors[0]
+        return uuids
+
+    @staticmethod
+    def chunk_ids(documents: List[Document]) -> List[str]:
+        """Deterministic ids for ``documents``, per source document (see ``app.utils.chunks.chunk_ids``)."""
+        by_source = defaultdict(list)
+        for idx, doc in enumerate(documents):
+            by_source[doc.metadata.get("source_document_id")].append(idx)
+        ids = [None] * len(documents)
+        for source_document_id, indexes in by_source.items():
+            if not source_document_id:
+                for idx in indexes:
+                    ids[idx] = str(uuid.uuid4())
+                continue
+            hashes = [
+                documents[idx].metadata.get("chunk_hash") or chunk_hash(documents[idx].page_content)
+                for idx in indexes
+            ]
+            for idx, chunk_id in zip(indexes, chunk_ids(source_document_id, hashes)):
+                ids[idx] = chunk_id
+        return ids
+
+    @staticmethod
+    def embedding_texts(documents: List[Document]) -> List[str]:
+        """Text embedded for each chunk: the chunk alone, or with the topics
+        prefix when ``EMBED_CHUNK_TOPICS`` is set."""
+        if settings.EMBED_CHUNK_TOPICS:
+            return [doc.page_content for doc in documents]
+        return [chunk_content(doc.page_content) for doc in documents]
+
+    async def embed_texts(
+        self,
+        texts: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[List[float]]:
+        """Embed ``texts`` in bounded concurrent batches without storing them."""
+        return await embed_in_batches(self.embeddings, texts, on_progress=on_progress)
+
+    async def embed_missing(
+        self,
+        texts: List[str],
+        vectors: List[Optional[List[float]]],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[List[float]]:
+        """Fill in the ``None`` entries of ``vectors`` by embedding the matching texts."""
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+        if missing:
+            logger.info(f"Embedding {len(missing)}/{len(texts)} chunks without a derived vector")
+        embedded = await self.embed_texts([texts[idx] for idx in missing], on_progress=on_progress) if missing else []
+        vectors = list(vectors)
+        for idx, vector in zip(missing, embedded):
+            vectors[idx] = vector
+        return vectors
+
+    async def write_documents(self, ids: List[str], documents: List[Document], embeddings: List[List[float]]):
+        """Store already embedded documents. Upserts, so a retried write is harmless."""
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        try:
+            for start in range(0, len(documents), batch_size):
+                await self._write_batch(
+                    ids[start:start + batch_size],
+                    documents[start:start + batch_size],
+                    embeddings[start:start + batch_size],
+                )
+        finally:
+            for organization_id in {doc.metadata.get("organization_id") for doc in documents}:
+                await self._invalidate_answers(organization_id)
+
+    async def _write_batch(self, ids: List[str], documents: List[Document], embeddings: List[List[float]]):
+        for organization_id in {doc.metadata.get("organization_id") for doc in documents}:
+            rows = [idx for idx, doc in enumerate(documents) if doc.metadata.get("organization_id") == organization_id]
+            org_ids = [ids[idx] for idx in rows]
+            org_texts = [documents[idx].page_content for idx in rows]
+
+            def _upsert():
+                for collection in self.collections.write_collections(organization_id):
+                    collection.upsert(
+                        ids=org_ids,
+                        embeddings=[embeddings[idx] for idx in rows],
+                        documents=org_texts,
+                        metadatas=[documents[idx].metadata for idx in rows],
+                    )
+
+            # Upserts, so retrying a partly applied write is harmless
+            await with_retries("Chunk write", _upsert)
+            await run_blocking(self.lexical_index.add, organization_id, org_ids, org_texts)
+
+    async def document_exists(self, organization_id: str, source_document_id: str) -> bool:
+        def _exists():
+            collection = self.collections.read_collection(organization_id)
+            existing = collection.get(where={"source_document_id": source_document_id}, include=[], limit=1)
+            return bool(existing["ids"])
+
+        return await run_blocking(_exists)
+
+    async def stored_topics(self, organization_id: str, source_document_id: str) -> Optional[str]:
+        """Topics prefix of a stored document's chunks, or None if it has none.
+
+        Replacements reuse it so chunks kept from the stored version and new
+        chunks carry the same topics.
+        """
+        def _topics():
+            collection = self.collections.read_collection(organization_id)
+            existing = collection.get(where={"source_document_id": source_document_id}, include=["documents"], limit=1)
+            return chunk_topics(existing["documents"][0]) if existing["ids"] else None
+
+        return await run_blocking(_topics)
+
+    async def replace_documents(self, organization_id: str, source_document_id: str, documents: List[Document]) -> dict:
+        """Replace a document's chunks, embedding only chunks whose content changed.
+
+        Stored chunks are matched to the new ones by ``chunk_hash``. Matches
+        keep their embedding and get fresh metadata (part number, file name,
+        content hash). New chunks are embedded and inserted, and stored
+        chunks with no match are deleted.
+        """
+        chunk_hashes = [doc.metadata.get("chunk_hash") for doc in documents]
+        plan = await self.plan_replacement(organization_id, source_document_id, chunk_hashes)
+        return await self.apply_replacement(organization_id, source_document_id, plan, documents)
+
+    async def plan_replacement(self, organization_id: str, source_document_id: str, chunk_hashes: List[str]) -> dict:
+        """Match new chunks (by ``chunk_hash``) against the stored chunks of ``source_document_id``.
+
+        Returns the stored ids to keep, the indexes of the new chunks that
+        need embedding and the stored ids to delete.
+        """
+        def _existing_chunks():
+            collection = self.collections.read_collection(organization_id)
+            return collection.get(where={"source_document_id": source_document_id}, include=["metadatas"])
 
-            uuids = [str(uuid.uuid4()) for _ in range(len(documents))]
+        existing = await run_blocking(_existing_chunks)
+        stored_by_hash = {}
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            stored_by_hash.setdefault((metadata or {}).get("chunk_hash"), []).append(chunk_id)
 
-            vector_store.add_documents(documents=documents, ids=uuids)
+        unchanged_ids, unchanged_indexes, new_indexes = [], [], []
+        for idx, new_hash in enumerate(chunk_hashes):
+            candidates = stored_by_hash.get(new_hash)
+            if candidates:
+                unchanged_ids.append(candidates.pop())
+                unchanged_indexes.append(idx)
+            else:
+                new_indexes.append(idx)
+        return {
+            "unchanged_ids": unchanged_ids,
+            "unchanged_indexes": unchanged_indexes,
+            "new_indexes": new_indexes,
+            "orphan_ids": [chunk_id for ids in stored_by_hash.values() for chunk_id in ids],
+        }
+
+    async def apply_replacement(
+        self,
+        organization_id: str,
+        source_document_id: str,
+        plan: dict,
+        documents: List[Document],
+        new_ids: List[str] = None,
+        new_embeddings: List[List[float]] = None,
+    ) -> dict:
+        """Carry out a ``plan_replacement`` plan.
+
+        ``new_ids``/``new_embeddings`` are for chunks embedded ahead of time
+        (in ``new_indexes`` order); without them the new chunks are embedded here.
+
+        Unchanged chunks whose stored text differs from the new one (a
+        different topics prefix) get the new text, and are re-embedded when
+        ``EMBED_CHUNK_TOPICS`` puts the prefix in their vectors, so the
+        document never mixes two topic lists.
+        """
+        unchanged_ids = plan["unchanged_ids"]
+        unchanged_documents = [documents[idx] for idx in plan["unchanged_indexes"]]
+        new_documents = [documents[idx] for idx in plan["new_indexes"]]
+        orphan_ids = plan["orphan_ids"]
+
+        retexted = 0
+        if unchanged_ids:
+            def _stored_texts():
+                collection = self.collections.read_collection(organization_id)
+                stored = collection.get(ids=unchanged_ids, include=["documents"])
+                return dict(zip(stored["ids"], stored["documents"]))
+
+            stored_texts = await run_blocking(_stored_texts)
+            rows = [
+                idx for idx, (chunk_id, doc) in enumerate(zip(unchanged_ids, unchanged_documents))
+                if stored_texts.get(chunk_id) != doc.page_content
+            ]
+            retexted_rows = set(rows)
+            kept = [idx for idx in range(len(unchanged_ids)) if idx not in retexted_rows]
+
+            if kept:
+                def _update_metadata():
+                    for collection in self.collections.write_collections(organization_id):
+                        collection.update(
+                            ids=[unchanged_ids[idx] for idx in kept],
+                            metadatas=[unchanged_documents[idx].metadata for idx in kept],
+                        )
+
+                await run_blocking(_update_metadata)
+
+            if rows:
+                retexted_ids = [unchanged_ids[idx] for idx in rows]
+                retexted_documents = [unchanged_documents[idx] for idx in rows]
+                if settings.EMBED_CHUNK_TOPICS:
+                    embeddings = await self.embed_texts(self.embedding_texts(retexted_documents))
+                    await self.write_documents(retexted_ids, retexted_documents, embeddings)
+                else:
+                    def _update_texts():
+                        for collection in self.collections.write_collections(organization_id):
+                            collection.update(
+                                ids=retexted_ids,
+                                documents=[doc.page_content for doc in retexted_documents],
+                                metadatas=[doc.metadata for doc in retexted_documents],
+                            )
+
+                    await run_blocking(_update_texts)
+                    await run_blocking(
+                        self.lexical_index.add,
+                        organization_id,
+                        retexted_ids,
+                        [doc.page_content for doc in retexted_documents],
+                    )
+                    await self._invalidate_answers(organization_id)
+                retexted = len(rows)
+
+        # Insert before deleting so the document never disappears mid-replace
+        if new_documents and new_embeddings is not None:
+            await self.write_documents(new_ids, new_documents, new_embeddings)
+        elif new_documents:
+            ids = self.chunk_ids(documents)
+            await self.insert_documents(new_documents, ids=[ids[idx] for idx in plan["new_indexes"]])
+
+        if orphan_ids:
+            def _delete_orphans():
+                for collection in self.collections.write_collections(organization_id):
+                    collection.delete(ids=orphan_ids)
+
+            await run_blocking(_delete_orphans)
+            await run_blocking(self.lexical_index.remove, organization_id, orphan_ids)
+            await self._invalidate_answers(organization_id)
+
+        logger.info(
+            f"Replaced {source_document_id}: {len(unchanged_ids)} unchanged ({retexted} with new topics), "
+            f"{len(new_documents)} embedded, {len(orphan_ids)} removed"
+        )
+        return {
+            "unchanged": len(unchanged_ids),
+            "retexted": retexted,
+            "embedded": len(new_documents),
+            "removed": len(orphan_ids),
+        }
+
+    async def embed_query(self, query: str) -> List[float]:
+        return await run_blocking(self.embeddings.embed_query, query)
 
     async def search_documents(self, organization_id: str, query: str, k: int = 10):
-        with db_manager.get_client() as client:
-            if not client:
-                raise Exception("Failed to connect to the database")
-
-            vector_store = Chroma(
-                client=client,
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
-            )
+        query_embedding = await self.embed_query(query)
+        return await self.search_documents_by_vector(organization_id, query_embedding, k=k, query=query)
+
+    async def search_documents_by_vector(self, organization_id: str, query_embedding: List[float], k: int = 10, query: str = None):
+        """Return the top ``k`` chunks for an organization.
 
-            results = vector_store.similarity_search_with_score(
-                query,
-                k=k,
-                filter={"organization_id": organization_id}
+        With ``query`` given and hybrid search enabled, dense results and BM25
+        results from the organization's lexical index are merged with
+        reciprocal-rank fusion.
+        """
+        def _search():
+            collection = self.collections.read_collection(organization_id)
+            dense = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                where={"organization_id": organization_id},
+                include=["documents", "metadatas"],
             )
+            found = {
+                doc_id: Document(page_content=content, metadata=metadata or {})
+                for doc_id, content, metadata in zip(dense["ids"][0], dense["documents"][0], dense["metadatas"][0])
+            }
+            if not (query and settings.HYBRID_SEARCH_ENABLED):
+                return [found[doc_id] for doc_id in dense["ids"][0]]
 
-            # Convert results to Document objects
-            documents = [
-                Document(page_content=doc.page_content, metadata=doc.metadata) for doc, _ in results
-            ]
+            lexical_ids = [doc_id for doc_id, _ in self.lexical_index.search(organization_id, query, k)]
+            ranked_ids = reciprocal_rank_fusion([dense["ids"][0], lexical_ids], k=settings.HYBRID_RRF_K)[:k]
 
-            logger.info(f"Retrieved {len(documents)} documents from vector store")
-            return documents
+            missing = [doc_id for doc_id in ranked_ids if doc_id not in found]
+            if missing:
+                lexical = collection.get(ids=missing, include=["documents", "metadatas"])
+                for doc_id, content, metadata in zip(lexical["ids"], lexical["documents"], lexical["metadatas"]):
+                    found[doc_id] = Document(page_content=content, metadata=metadata or {})
+            return [found[doc_id] for doc_id in ranked_ids if doc_id in found]
+
+        documents = await run_blocking(_search)
+
+        logger.info(f"Retrieved {len(documents)} documents from vector store")
+        return documents
 
 
     async def delete_documents(self, organization_id: str, source_document_id: str):
-        with db_manager.get_client() as client:
-            if not client:
-                raise Exception("failed to connect to the database")
-            
-            collection = client.get_or_create_collection(self.collection_name)
-            collection.delete(
-                where={"source_document_id": source_document_id}
-            )
-            return {"message": "Documents deleted successfully"}
\ No newline at end of file
+        def _delete():
+            deleted = set()
+            for collection in self.collections.write_collections(organization_id):
+                existing = collection.get(
+                    where={"source_document_id": source_document_id},
+                    include=[]
+                )
+                collection.delete(
+                    where={"source_document_id": source_document_id}
+                )
+                deleted.update(existing["ids"])
+            return list(deleted)
+
+        deleted_ids = await run_blocking(_delete)
+        await run_blocking(self.lexical_index.remove, organization_id, deleted_ids)
+        if self.manifest is not None:
+            await run_blocking(self.manifest.remove_document, organization_id, source_document_id)
+        await self._invalidate_answers(organization_id)
+        return {"message": "Documents deleted successfully"}
+
+    async def _invalidate_answers(self, organization_id: str):
+        if self.answer_cache is not None and organization_id:
+            await run_blocking(self.answer_cache.invalidate, organization_id)
@@ -0,0 +1,35 @@
+from app.core.celery_app import celery_app
+from app.services.registry import registry
+from app.core.config import settings
+from app.core.logging_config import logging
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, max_retries=None)
+def migrate_organization_collections(self, organization_id: str):
+    """Move one organization's documents and QA pairs into their own collections."""
+    # Compaction deletes QA rows in bulk; hold its lock so it cannot run
+    # mid-copy, and wait for a running one to finish
+    merge_queue = registry.question_answer_service().merge_queue
+    if not merge_queue.lock_compaction(organization_id, settings.CELERY_VISIBILITY_TIMEOUT):
+        logger.info(f"QA compaction running for {organization_id}, retrying collection migration later")
+        raise self.retry(countdown=60)
+
+    reports = {}
+    try:
+        for name, collections in (
+            ("documents", registry.document_collections()),
+            ("questions_answers", registry.question_collections()),
+        ):
+            if not collections.lock_migration(organization_id, settings.CELERY_VISIBILITY_TIMEOUT):
+                logger.info(f"Collection migration of {name} already running for {organization_id}")
+                reports[name] = {"organization_id": organization_id, "skipped": True}
+                continue
+            try:
+                reports[name] = collections.migrate(organization_id)
+            finally:
+                collections.unlock_migration(organization_id)
+    finally:
+        merge_queue.unlock_compaction(organization_id)
+    return {"organization_id": organization_id, "collections": reports}
@@ -1,33 +1,134 @@
 from app.core.celery_app import celery_app
-from app.services.document_ingestion import DocumentIngestionService
-from app.services.vector_db import VectorDBService
+from app.services.registry import registry
 from app.core.logging_config import logging
+from app.core.config import settings
+from app.core.executor import run_blocking
+from app.services.semantic_chunker import use_derived_embeddings
+from app.tasks.pipeline import finish_batch_document
+from app.tasks.progress import ProgressTask
+from app.tasks.runtime import run_async
 import asyncio
 import os
 
 logger = logging.getLogger(__name__)
 
-@celery_app.task(bind=True)
-def process_document(self, file_path: str, organization_id: str, task_id: str):
+async def _ingest_concurrently(
+    task,
+    ingestion_service,
+    vector_db_service,
+    file_path: str,
+    organization_id: str,
+    file_name: str = None,
+    content_hash: str = None,
+    source_document_id: str = None,
+):
+    """Extract topics and embed the chunks at the same time, then store them."""
+    task.update_state(state='PROGRESS', meta={'status': 'Partitioning document', 'current': 1, 'total': 3})
+    docs = await run_blocking(ingestion_service.partition, file_path)
+    if use_derived_embeddings():
+        chunks, vectors = await run_blocking(ingestion_service.chunk_with_embeddings, docs)
+    else:
+        chunks = await run_blocking(ingestion_service.chunk, docs)
+        vectors = [None] * len(chunks)
+
+    task.update_state(state='PROGRESS', meta={'status': 'Extracting topics and embedding chunks', 'current': 2, 'total': 3})
+    keywords, embeddings = await asyncio.gather(
+        ingestion_service.extract_keywords(' '.join([chunk.page_content for chunk in chunks])),
+        vector_db_service.embed_missing([chunk.page_content for chunk in chunks], vectors),
+    )
+    processed_docs = ingestion_service.build_documents(
+        chunks,
+        keywords,
+        file_path,
+        organization_id,
+        file_name=file_name,
+        content_hash=content_hash,
+        source_document_id=source_document_id,
+    )
+
+    task.update_state(state='PROGRESS', meta={'status': 'Inserting into vector database', 'current': 3, 'total': 3})
+    ids = vector_db_service.chunk_ids(processed_docs)
+    await vector_db_service.write_documents(ids, processed_docs, embeddings)
+    return {"embedded": len(processed_docs)}
+
+
+@celery_app.task(bind=True, base=ProgressTask)
+def process_document(
+    self,
+    file_path: str,
+    organization_id: str,
+    task_id: str,
+    file_name: str = None,
+    content_hash: str = None,
+    source_document_id: str = None,
+    mode: str = "create",
+    batch_id: str = None,
+):
     logger.info(f"Starting document processing for task {task_id}")
     try:
-        ingestion_service = DocumentIngestionService()
-        vector_db_service = VectorDBService()
+        ingestion_service = registry.document_ingestion_service()
+        vector_db_service = registry.vector_db_service()
+
+        if mode == "create" and not settings.EMBED_CHUNK_TOPICS:
+            stats = run_async(_ingest_concurrently(
+                self,
+                ingestion_service,
+                vector_db_service,
+                file_path,
+                organization_id,
+                file_name=file_name,
+                content_hash=content_hash,
+                source_document_id=source_document_id,
+            ))
+            if content_hash and source_document_id:
+                registry.document_manifest().mark_completed(organization_id, content_hash, source_document_id)
+            logger.info(f"Document processing completed for task {task_id}")
+            if batch_id:
+                finish_batch_document(batch_id, task_id, succeeded=True, chunks=stats.get("embedded", 0))
+            return {"status": "success", "task_id": task_id, "source_document_id": source_document_id, **stats}
 
-        # Use asyncio to run the asynchronous methods
-        loop = asyncio.get_event_loop()
-        
         self.update_state(state='PROGRESS', meta={'status': 'Processing document', 'current': 1, 'total': 2})
-        processed_docs = loop.run_until_complete(ingestion_service.process_document(file_path, organization_id))
+        topics = None
+        if mode == "replace":
+            # Keep the stored topics so unchanged chunks stay as they are
+            topics = run_async(vector_db_service.stored_topics(organization_id, source_document_id))
+        processed_docs = run_async(ingestion_service.process_document(
+            file_path,
+            organization_id,
+            file_name=file_name,
+            content_hash=content_hash,
+            source_document_id=source_document_id,
+            topics=topics,
+        ))
         
         self.update_state(state='PROGRESS', meta={'status': 'Inserting into vector database', 'current': 2, 'total': 2})
-        loop.run_until_complete(vector_db_service.insert_documents(processed_docs))
+        if mode == "replace":
+            stats = run_async(
+                vector_db_service.replace_documents(organization_id, source_document_id, processed_docs)
+            )
+        else:
+            run_async(vector_db_service.insert_documents(
+                processed_docs,
+                on_progress=lambda done, total: self.update_state(
+                    state='PROGRESS',
+                    meta={'status': f'Embedded {done}/{total} chunks', 'current': 2, 'total': 2},
+                ),
+            ))
+            stats = {"embedded": len(processed_docs)}
+        if content_hash and source_document_id:
+            registry.document_manifest().mark_completed(organization_id, content_hash, source_document_id)
 
         logger.info(f"Document processing completed for task {task_id}")
         os.unlink(file_path)
-        return {"status": "success", "task_id": task_id}
+        if batch_id:
+            finish_batch_document(batch_id, task_id, succeeded=True, chunks=stats.get("embedded", 0))
+        return {"status": "success", "task_id": task_id, "source_document_id": source_document_id, **stats}
     except Exception as e:
         logger.error(f"Error processing document for task {task_id}: {str(e)}")
+        if content_hash and source_document_id:
+            registry.document_manifest().release(organization_id, content_hash, source_document_id)
+        if batch_id:
+            finish_batch_document(batch_id, task_id, succeeded=False, error=str(e))
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
 
@@ -0,0 +1,316 @@
+# app/tasks/pipeline.py
+
+import os
+import uuid
+from celery import chain, group
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.services.ingestion_batch import IngestionBatchTracker
+from app.services.ingestion_checkpoint import IngestionCheckpointStore, documents_from_json, documents_to_json
+from app.services.registry import registry
+from app.services.semantic_chunker import use_derived_embeddings
+from app.services.task_status import publish_progress
+from app.tasks.progress import ProgressTask
+from app.tasks.runtime import run_async
+from app.utils.chunks import chunk_hash, chunk_ids
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["partition", "chunk", "enrich", "embed", "write"]
+
+checkpoints = IngestionCheckpointStore()
+batches = IngestionBatchTracker()
+
+
+def queue_ingestion(
+    file_path: str,
+    organization_id: str,
+    task_id: str,
+    file_name: str = None,
+    content_hash: str = None,
+    source_document_id: str = None,
+    mode: str = "create",
+    batch_id: str = None,
+):
+    """Queue ingestion of an uploaded file, staged or as a single task."""
+    if settings.INGESTION_PIPELINE_ENABLED:
+        start_ingestion_pipeline(
+            file_path,
+            organization_id,
+            task_id,
+            file_name=file_name,
+            content_hash=content_hash,
+            source_document_id=source_document_id,
+            mode=mode,
+            batch_id=batch_id,
+        )
+        return
+
+    celery_app.send_task(
+        'app.tasks.document.process_document',
+        args=[file_path, organization_id, task_id],
+        kwargs={
+            'file_name': file_name,
+            'content_hash': content_hash,
+            'source_document_id': source_document_id,
+            'mode': mode,
+            'batch_id': batch_id,
+        },
+        task_id=task_id
+    )
+
+
+def dispatch_batch(batch_id: str, count: int = 1):
+    """Start up to ``count`` queued files of a bulk upload."""
+    started = 0
+    while started < count:
+        item = batches.pop_pending(batch_id)
+        if item is None:
+            return
+        try:
+            queue_ingestion(
+                item["file_path"],
+                item["organization_id"],
+                item["task_id"],
+                file_name=item["file_name"],
+                content_hash=item["content_hash"],
+                source_document_id=item["source_document_id"],
+                batch_id=batch_id,
+            )
+            batches.mark_started(batch_id, item["task_id"])
+            started += 1
+        except Exception as e:
+            logger.error(f"Failed to queue {item['file_name']} from batch {batch_id}: {str(e)}")
+            registry.document_manifest().release(item["organization_id"], item["content_hash"], item["source_document_id"])
+            if os.path.exists(item["file_path"]):
+                os.unlink(item["file_path"])
+            batches.mark_finished(batch_id, item["task_id"], succeeded=False, error=str(e))
+
+
+def finish_batch_document(batch_id: str, task_id: str, succeeded: bool, chunks: int = 0, error: str = None):
+    """Record a finished file of a bulk upload and start the next queued one."""
+    try:
+        if batches.mark_finished(batch_id, task_id, succeeded, chunks=chunks, error=error):
+            dispatch_batch(batch_id)
+    except Exception as e:
+        logger.error(f"Failed to update batch {batch_id}: {str(e)}")
+
+
+def start_ingestion_pipeline(
+    file_path: str,
+    organization_id: str,
+    pipeline_id: str,
+    file_name: str = None,
+    content_hash: str = None,
+    source_document_id: str = None,
+    mode: str = "create",
+    batch_id: str = None,
+):
+    """Queue the staged ingestion of one uploaded file.
+
+    ``pipeline_id`` is the id handed back to the client; every stage reports
+    its progress (and the final result) under it, so the task status
+    endpoint works the same as for ``process_document``. Unless chunks are
+    embedded with their topics, the enrich and embed stages run in parallel.
+    """
+    context = {
+        "pipeline_id": pipeline_id,
+        "file_path": file_path,
+        "organization_id": organization_id,
+        "file_name": file_name,
+        "content_hash": content_hash,
+        # Fixed up front so retried stages derive the same chunk ids
+        "source_document_id": source_document_id or str(uuid.uuid4()),
+        "mode": mode,
+        "batch_id": batch_id,
+    }
+
+    def stage(name: str, *args):
+        return celery_app.signature(f"app.tasks.pipeline.{name}_document", args=args, immutable=bool(args))
+
+    if settings.EMBED_CHUNK_TOPICS:
+        middle = [stage("enrich"), stage("embed")]
+    else:
+        # Both stages only need the chunk checkpoint; they are immutable so
+        # they take the context given here instead of the chunk stage's result
+        middle = [group(stage("enrich", context), stage("embed", context))]
+    return chain(
+        stage("partition", context),
+        stage("chunk"),
+        *middle,
+        stage("write"),
+    ).apply_async()
+
+
+def _context(value):
+    # Stages after a group receive the list of the group's results
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _cleanup(context: dict):
+    checkpoints.clear(context["pipeline_id"])
+    if os.path.exists(context["file_path"]):
+        os.unlink(context["file_path"])
+
+
+class PipelineStage(ProgressTask):
+    """Base for ingestion stages: retried on their own, and on final failure
+    the whole pipeline is marked failed and its resources released."""
+
+    autoretry_for = (Exception,)
+    retry_backoff = True
+    max_retries = settings.INGESTION_STAGE_MAX_RETRIES
+
+    def report(self, context: dict, stage: str, status: str):
+        self.update_state(
+            task_id=context["pipeline_id"],
+            state='PROGRESS',
+            meta={'status': status, 'stage': stage, 'current': STAGES.index(stage) + 1, 'total': len(STAGES)},
+        )
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        context = _context(args[0] if args else kwargs.get("context"))
+        if not context:
+            return
+        logger.error(f"Ingestion pipeline {context['pipeline_id']} failed in {self.name}: {str(exc)}")
+        try:
+            self.backend.mark_as_failure(context["pipeline_id"], exc, traceback=einfo.traceback if einfo else None)
+            publish_progress(context["pipeline_id"], "FAILURE", {"error": str(exc)})
+            if context.get("content_hash") and context.get("source_document_id"):
+                registry.document_manifest().release(
+                    context["organization_id"], context["content_hash"], context["source_document_id"]
+                )
+        finally:
+            _cleanup(context)
+            if context.get("batch_id"):
+                finish_batch_document(context["batch_id"], context["pipeline_id"], succeeded=False, error=str(exc))
+
+
+@celery_app.task(bind=True, base=PipelineStage)
+def partition_document(self, context: dict):
+    pipeline_id = context["pipeline_id"]
+    self.report(context, "partition", "Partitioning document")
+    if not checkpoints.exists(pipeline_id, "partition"):
+        docs = registry.document_ingestion_service().partition(context["file_path"])
+        checkpoints.save(pipeline_id, "partition", documents_to_json(docs))
+    return context
+
+
+@celery_app.task(bind=True, base=PipelineStage)
+def chunk_document(self, context: dict):
+    pipeline_id = context["pipeline_id"]
+    self.report(context, "chunk", "Chunking document")
+    if not checkpoints.exists(pipeline_id, "chunk"):
+        docs = documents_from_json(checkpoints.load(pipeline_id, "partition"))
+        ingestion_service = registry.document_ingestion_service()
+        if use_derived_embeddings():
+            chunks, vectors = ingestion_service.chunk_with_embeddings(docs)
+            checkpoints.save(pipeline_id, "chunk_vectors", vectors)
+        else:
+            chunks = ingestion_service.chunk(docs)
+        checkpoints.save(pipeline_id, "chunk", documents_to_json(chunks))
+    return context
+
+
+@celery_app.task(bind=True, base=PipelineStage)
+def enrich_document(self, context: dict):
+    pipeline_id = context["pipeline_id"]
+    self.report(context, "enrich", "Extracting topics")
+    if not checkpoints.exists(pipeline_id, "enrich"):
+        chunks = documents_from_json(checkpoints.load(pipeline_id, "chunk"))
+        topics = None
+        if context["mode"] == "replace":
+            # Keep the stored topics so unchanged chunks stay as they are
+            topics = run_async(registry.vector_db_service().stored_topics(
+                context["organization_id"], context["source_document_id"]
+            ))
+        processed_docs = run_async(registry.document_ingestion_service().enrich(
+            chunks,
+            context["file_path"],
+            context["organization_id"],
+            file_name=context["file_name"],
+            content_hash=context["content_hash"],
+            source_document_id=context["source_document_id"],
+            topics=topics,
+        ))
+        checkpoints.save(pipeline_id, "enrich", documents_to_json(processed_docs))
+    return context
+
+
+@celery_app.task(bind=True, base=PipelineStage)
+def embed_document(self, context: dict):
+    pipeline_id = context["pipeline_id"]
+    self.report(context, "embed", "Embedding chunks")
+    if not checkpoints.exists(pipeline_id, "embed"):
+        vector_db_service = registry.vector_db_service()
+        chunks = documents_from_json(checkpoints.load(pipeline_id, "chunk"))
+        if settings.EMBED_CHUNK_TOPICS:
+            texts = vector_db_service.embedding_texts(documents_from_json(checkpoints.load(pipeline_id, "enrich")))
+        else:
+            texts = [chunk.page_content for chunk in chunks]
+        # Vectors derived by the chunker; None means the chunk still needs embedding
+        vectors = checkpoints.load(pipeline_id, "chunk_vectors") or [None] * len(texts)
+
+        chunk_hashes = [chunk_hash(chunk.page_content) for chunk in chunks]
+        ids = chunk_ids(context["source_document_id"], chunk_hashes)
+        plan = None
+        if context["mode"] == "replace":
+            # Only chunks that changed since the stored version need embedding
+            plan = run_async(vector_db_service.plan_replacement(
+                context["organization_id"], context["source_document_id"], chunk_hashes
+            ))
+            texts = [texts[idx] for idx in plan["new_indexes"]]
+            vectors = [vectors[idx] for idx in plan["new_indexes"]]
+            ids = [ids[idx] for idx in plan["new_indexes"]]
+
+        embeddings = run_async(vector_db_service.embed_missing(
+            texts,
+            vectors,
+            on_progress=lambda done, total: self.report(context, "embed", f"Embedded {done}/{total} chunks"),
+        ))
+        checkpoints.save(pipeline_id, "embed", {
+            "ids": ids,
+            "embeddings": embeddings,
+            "plan": plan,
+        })
+    return context
+
+
+@celery_app.task(bind=True, base=PipelineStage)
+def write_document(self, context):
+    context = _context(context)
+    pipeline_id = context["pipeline_id"]
+    organization_id = context["organization_id"]
+    source_document_id = context["source_document_id"]
+    self.report(context, "write", "Inserting into vector database")
+
+    vector_db_service = registry.vector_db_service()
+    documents = documents_from_json(checkpoints.load(pipeline_id, "enrich"))
+    embedded = checkpoints.load(pipeline_id, "embed")
+    if embedded["plan"] is not None:
+        stats = run_async(vector_db_service.apply_replacement(
+            organization_id,
+            source_document_id,
+            embedded["plan"],
+            documents,
+            new_ids=embedded["ids"],
+            new_embeddings=embedded["embeddings"],
+        ))
+    else:
+        run_async(vector_db_service.write_documents(embedded["ids"], documents, embedded["embeddings"]))
+        stats = {"embedded": len(documents)}
+
+    if context["content_hash"] and source_document_id:
+        registry.document_manifest().mark_completed(organization_id, context["content_hash"], source_document_id)
+
+    result = {"status": "success", "task_id": pipeline_id, "source_document_id": source_document_id, **stats}
+    self.backend.store_result(pipeline_id, result, 'SUCCESS')
+    publish_progress(pipeline_id, "SUCCESS", result)
+    _cleanup(context)
+    if context.get("batch_id"):
+        finish_batch_document(context["batch_id"], pipeline_id, succeeded=True, chunks=stats.get("embedded", 0))
+    logger.info(f"Ingestion pipeline {pipeline_id} completed")
+    return result
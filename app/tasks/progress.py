@@ -0,0 +1,16 @@
+# app/tasks/progress.py
+
+from app.core.celery_app import celery_app
+from app.services.task_status import publish_progress
+
+
+class ProgressTask(celery_app.Task):
+    """Task whose state updates are also pushed to ``task_progress:{id}``
+    subscribers, so clients can stream progress instead of polling."""
+
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+        publish_progress(task_id or self.request.id, state, meta)
+
+    def on_success(self, retval, task_id, args, kwargs):
+        publish_progress(task_id, "SUCCESS", retval)
@@ -0,0 +1,49 @@
+from app.core.celery_app import celery_app
+from app.services.registry import registry
+from app.core.config import settings
+from app.core.logging_config import logging
+from app.tasks.runtime import run_async
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+@celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def merge_question_answers(self, question_id: str, contents: List[str], organization_id: str = None):
+    """Fold QA pairs found to duplicate ``question_id`` into that entry.
+
+    Imports now store their duplicates and queue them for
+    ``merge_pending_questions``; this drains tasks queued before that.
+    """
+    logger.info(f"Merging {len(contents)} QA pairs into {question_id}")
+    merged = run_async(registry.question_answer_service().merge_into(question_id, contents, organization_id))
+    return {"question_id": question_id, "merged": len(contents) if merged else 0}
+
+
+@celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def merge_pending_questions(self, target_id: str, organization_id: str = None):
+    """Merge every near-duplicate queued for ``target_id`` in one LLM call."""
+    merged = run_async(registry.question_answer_service().merge_pending(target_id, organization_id))
+    return {"question_id": target_id, "merged": merged}
+
+
+@celery_app.task(bind=True)
+def compact_question_answers(self, organization_id: str):
+    """Cluster and merge one organization's near-duplicate QA entries."""
+    merge_queue = registry.question_answer_service().merge_queue
+    if not merge_queue.lock_compaction(organization_id, settings.CELERY_VISIBILITY_TIMEOUT):
+        logger.info(f"QA compaction already running for {organization_id}")
+        return {"organization_id": organization_id, "skipped": True}
+    try:
+        return run_async(registry.question_answer_service().compact_organization(organization_id))
+    finally:
+        merge_queue.unlock_compaction(organization_id)
+
+
+@celery_app.task
+def schedule_question_compaction():
+    """Periodic entry point: queue a compaction for every organization."""
+    organization_ids = run_async(registry.organization_service().list_organization_ids())
+    for organization_id in organization_ids:
+        compact_question_answers.delay(organization_id)
+    logger.info(f"Queued QA compaction for {len(organization_ids)} organizations")
+    return {"organizations": len(organization_ids)}
@@ -0,0 +1,60 @@
+# app/tasks/runtime.py
+
+import asyncio
+import threading
+from celery.signals import worker_process_init, worker_process_shutdown
+from app.core.db import db_manager
+from app.core.executor import shutdown_executor
+from app.core.logging_config import logging
+from app.core.redis_client import reset_redis
+from app.services.registry import registry
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Event loop reused by every task run on this worker thread.
+
+    Shared clients (e.g. the LLM's async transport) bind to the loop they
+    were first used on, so tasks must not each get a fresh loop.
+    """
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _local.loop = loop
+    return loop
+
+
+def run_async(coro):
+    return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Connections inherited from the parent process must not be shared
+    # with it, so drop them and build this process's own clients once
+    db_manager.disconnect()
+    shutdown_executor()
+    reset_redis()
+    try:
+        db_manager.connect()
+        registry.document_manifest()
+        registry.document_ingestion_service()
+        registry.vector_db_service()
+    except Exception as e:
+        logger.error(f"Failed to warm up worker process: {str(e)}")
+    get_worker_loop()
+    logger.info("Worker process initialized")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    registry.shutdown()
+    shutdown_executor()
+    db_manager.disconnect()
+    loop = getattr(_local, "loop", None)
+    if loop is not None and not loop.is_closed():
+        loop.close()
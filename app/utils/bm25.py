@@ -0,0 +1,35 @@
+import math
+import re
+from typing import List
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+COMPOUND_SEPARATORS = re.compile(r"[-_./:]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase and split text into lexical tokens.
+
+    Compound identifiers such as SKU codes (``AB-1234``), error codes and
+    field names (``shipment_status``) are kept as a single token and are
+    also emitted as their parts, so both exact and partial mentions match.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if COMPOUND_SEPARATORS.search(token):
+            tokens.extend(part for part in COMPOUND_SEPARATORS.split(token) if part)
+    return tokens
+
+
+def idf(num_docs: int, doc_freq: int) -> float:
+    """BM25 inverse document frequency, kept positive for very common terms."""
+    return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def term_score(tf: int, doc_len: int, avg_doc_len: float, term_idf: float, k1: float = 1.5, b: float = 0.75) -> float:
+    """BM25 contribution of one query term to one document."""
+    if tf == 0:
+        return 0.0
+    norm = 1 - b + b * (doc_len / avg_doc_len if avg_doc_len else 1.0)
+    return term_idf * tf * (k1 + 1) / (tf + k1 * norm)
@@ -0,0 +1,51 @@
+import hashlib
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+TOPICS_PREFIX = "Relevant Topics Covered: "
+CONTENT_MARKER = "\nContent: "
+
+
+def format_chunk(topics: str, content: str) -> str:
+    """Stored chunk text: the document's topics followed by the chunk itself."""
+    # Newlines are folded so the first CONTENT_MARKER always ends the topics line
+    topics = " ".join(topics.split())
+    return f"{TOPICS_PREFIX}{topics}{CONTENT_MARKER}{content}"
+
+
+def chunk_content(text: str) -> str:
+    """Chunk text without the topics prefix added by ``format_chunk``."""
+    if text.startswith(TOPICS_PREFIX):
+        _, marker, content = text.partition(CONTENT_MARKER)
+        if marker:
+            return content
+    return text
+
+
+def chunk_topics(text: str) -> Optional[str]:
+    """Topics prefix added by ``format_chunk``, or None if ``text`` has none."""
+    if text.startswith(TOPICS_PREFIX):
+        topics, marker, _ = text[len(TOPICS_PREFIX):].partition(CONTENT_MARKER)
+        if marker:
+            return topics
+    return None
+
+
+def chunk_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def chunk_ids(source_document_id: str, chunk_hashes: List[str]) -> List[str]:
+    """Stable ids for a document's chunks, so a retried write upserts in place.
+
+    The n-th chunk with a given hash gets the same id on every run. Hashes
+    are used rather than positions so a replace never hands a new chunk the
+    id of a stored chunk it keeps.
+    """
+    seen = Counter()
+    ids = []
+    for content_hash in chunk_hashes:
+        ids.append(str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source_document_id}:{content_hash}:{seen[content_hash]}")))
+        seen[content_hash] += 1
+    return ids
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.core.exceptions import AppException
+from app.core.executor import run_blocking
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    file_name: str
+    content_hash: str
+    size: int
+
+
+async def save_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Stream an uploaded file to a temporary file in fixed-size chunks.
+
+    The SHA-256 of the content is computed while streaming so later stages
+    can use it without reading the file again. The original extension is
+    kept on the temporary file so loaders can pick a parser from it.
+
+    Raises:
+        AppException: 413 if the upload is larger than ``max_bytes``.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    file_name = os.path.basename(file.filename or "upload")
+    _, extension = os.path.splitext(file_name)
+
+    hasher = hashlib.sha256()
+    size = 0
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension.lower(), dir=settings.UPLOAD_DIR)
+    try:
+        with temp_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AppException(
+                        status_code=413,
+                        detail=f"File exceeds the maximum upload size of {max_bytes} bytes",
+                    )
+                hasher.update(chunk)
+                await run_blocking(temp_file.write, chunk)
+    except Exception:
+        os.unlink(temp_file.name)
+        raise
+
+    return StoredUpload(path=temp_file.name, file_name=file_name, content_hash=hasher.hexdigest(), size=size)
+
+
+def _is_archive_member(name: str) -> bool:
+    base_name = os.path.basename(name)
+    return bool(base_name) and not base_name.startswith(".") and not name.startswith("__MACOSX/")
+
+
+def extract_zip_upload(
+    upload: StoredUpload,
+    max_files: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+) -> List[StoredUpload]:
+    """
+    Extract the files of an uploaded zip archive to temporary files.
+
+    Directories, hidden files and macOS resource forks are skipped. Each
+    member is hashed while it is copied, like ``save_upload``. Files
+    extracted so far are removed when the archive is rejected.
+
+    Raises:
+        AppException: 400 if the archive is invalid, holds too many files or
+            a member compresses more than ``BULK_EXTRACT_MAX_RATIO``; 413 if a
+            member is larger than ``max_bytes`` or the extracted files
+            together exceed ``max_total_bytes``.
+    """
+    max_files = max_files or settings.BULK_UPLOAD_MAX_FILES
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    max_total_bytes = max_total_bytes if max_total_bytes is not None else settings.BULK_EXTRACT_MAX_BYTES
+    max_ratio = settings.BULK_EXTRACT_MAX_RATIO
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    total_size = 0
+
+    try:
+        archive = zipfile.ZipFile(upload.path)
+    except zipfile.BadZipFile:
+        raise AppException(status_code=400, detail=f"{upload.file_name} is not a valid zip archive")
+
+    extracted = []
+    try:
+        with archive:
+            members = [info for info in archive.infolist() if not info.is_dir() and _is_archive_member(info.filename)]
+            if len(members) > max_files:
+                raise AppException(status_code=400, detail=f"Archive holds more than {max_files} files")
+            if sum(info.file_size for info in members) > max_total_bytes:
+                raise AppException(
+                    status_code=413,
+                    detail=f"{upload.file_name} extracts to more than {max_total_bytes} bytes",
+                )
+            for info in members:
+                # The declared size can lie, so the copy loop checks as well
+                if info.file_size > max_bytes:
+                    raise AppException(
+                        status_code=413,
+                        detail=f"{info.filename} exceeds the maximum upload size of {max_bytes} bytes",
+                    )
+                file_name = os.path.basename(info.filename)
+                _, extension = os.path.splitext(file_name)
+                hasher = hashlib.sha256()
+                size = 0
+                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension.lower(), dir=settings.UPLOAD_DIR)
+                extracted.append(StoredUpload(path=temp_file.name, file_name=file_name, content_hash="", size=0))
+                with temp_file, archive.open(info) as member:
+                    while True:
+                        chunk = member.read(chunk_size)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        total_size += len(chunk)
+                        if size > max_bytes:
+                            raise AppException(
+                                status_code=413,
+                                detail=f"{info.filename} exceeds the maximum upload size of {max_bytes} bytes",
+                            )
+                        if total_size > max_total_bytes:
+                            raise AppException(
+                                status_code=413,
+                                detail=f"{upload.file_name} extracts to more than {max_total_bytes} bytes",
+                            )
+                        # Checked on the bytes actually produced, not the declared sizes
+                        if size > chunk_size and size > max_ratio * max(info.compress_size, 1):
+                            raise AppException(
+                                status_code=400,
+                                detail=f"{info.filename} has a suspicious compression ratio",
+                            )
+                        hasher.update(chunk)
+                        temp_file.write(chunk)
+                extracted[-1] = StoredUpload(path=temp_file.name, file_name=file_name, content_hash=hasher.hexdigest(), size=size)
+    except Exception:
+        for stored in extracted:
+            if os.path.exists(stored.path):
+                os.unlink(stored.path)
+        raise
+
+    return extracted